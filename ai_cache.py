@@ -0,0 +1,133 @@
+import os
+import time
+import shutil
+import hashlib
+import threading
+
+# --- CONTENT-ADDRESSED ANALYSIS CACHE ---
+# One directory per source (keyed by a sampled hash of the file or by the
+# canonical video ID) holding the extracted audio, the English transcript and
+# the Burmese translation. Entries expire by TTL and are evicted least
+# recently used first once the cache grows past its byte budget.
+
+SAMPLE_BYTES = 4 * 1024 * 1024
+
+def file_cache_key(path):
+    """Fast content key: size + first/middle/last 4MB, so multi-GB files hash in milliseconds."""
+    size = os.path.getsize(path)
+    h = hashlib.blake2b(digest_size=16)
+    h.update(str(size).encode())
+    with open(path, 'rb') as f:
+        if size <= SAMPLE_BYTES * 3:
+            h.update(f.read())
+        else:
+            for off in (0, size // 2, size - SAMPLE_BYTES):
+                f.seek(off)
+                h.update(f.read(SAMPLE_BYTES))
+    return 'file-' + h.hexdigest()
+
+def video_id_cache_key(extractor, video_id):
+    h = hashlib.blake2b(f"{extractor}:{video_id}".lower().encode(), digest_size=16)
+    return 'vid-' + h.hexdigest()
+
+class AnalysisCache:
+    def __init__(self, root, max_bytes, ttl_seconds, evict_interval=60):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self.evict_interval = evict_interval
+        self._last_evict = 0
+        self._lock = threading.Lock()
+        self.counters = {}
+        os.makedirs(root, exist_ok=True)
+
+    def _count(self, artifact, outcome):
+        with self._lock:
+            name = f"{artifact}_{outcome}"
+            self.counters[name] = self.counters.get(name, 0) + 1
+
+    def entry_dir(self, key):
+        return os.path.join(self.root, key)
+
+    def path(self, key, artifact):
+        return os.path.join(self.entry_dir(key), artifact)
+
+    def lookup(self, keys, artifact):
+        """Returns the cached artifact path for the first key that has it, or None."""
+        for key in keys:
+            p = self.path(key, artifact)
+            if os.path.exists(p):
+                try: os.utime(self.entry_dir(key))  # last access for LRU
+                except OSError: pass
+                self._count(artifact, 'hit')
+                return p
+        self._count(artifact, 'miss')
+        return None
+
+    def read_text(self, keys, artifact):
+        p = self.lookup(keys, artifact)
+        if not p: return None
+        with open(p, 'r', encoding='utf-8') as f: return f.read()
+
+    def store_file(self, keys, artifact, src_path):
+        """Moves src_path into the first key's entry and hard-links/copies it into the others."""
+        stored = None
+        for key in keys:
+            os.makedirs(self.entry_dir(key), exist_ok=True)
+            dst = self.path(key, artifact)
+            tmp = f"{dst}.{os.getpid()}.{threading.get_ident()}.tmp"
+            if stored is None: shutil.move(src_path, tmp)
+            else:
+                try: os.link(stored, tmp)
+                except OSError: shutil.copyfile(stored, tmp)
+            os.replace(tmp, dst)
+            stored = stored or dst
+        self.maybe_evict()
+        return stored
+
+    def store_text(self, keys, artifact, text):
+        for key in keys:
+            os.makedirs(self.entry_dir(key), exist_ok=True)
+            dst = self.path(key, artifact)
+            tmp = f"{dst}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(tmp, 'w', encoding='utf-8') as f: f.write(text)
+            os.replace(tmp, dst)
+        self.maybe_evict()
+
+    # --- EVICTION ---
+    def _entries(self):
+        entries = []
+        for key in os.listdir(self.root):
+            d = self.entry_dir(key)
+            if not os.path.isdir(d): continue
+            try:
+                size = sum(os.path.getsize(os.path.join(d, n)) for n in os.listdir(d))
+                entries.append((os.path.getmtime(d), size, d))
+            except OSError: continue
+        return entries
+
+    def maybe_evict(self, force=False):
+        now = time.time()
+        if not force and now - self._last_evict < self.evict_interval: return 0
+        self._last_evict = now
+        entries = sorted(self._entries())
+        total = sum(e[1] for e in entries)
+        removed = 0
+        for mtime, size, d in entries:
+            if now - mtime <= self.ttl_seconds and total <= self.max_bytes: break
+            shutil.rmtree(d, ignore_errors=True)
+            total -= size
+            removed += 1
+        if removed: print(f"🗑️ Analysis Cache: evicted {removed} entries.")
+        return removed
+
+    def stats(self):
+        entries = self._entries()
+        with self._lock: counters = dict(self.counters)
+        return {
+            'entries': len(entries),
+            'bytes': sum(e[1] for e in entries),
+            'max_bytes': self.max_bytes,
+            'ttl_seconds': self.ttl_seconds,
+            'counters': counters,
+        }
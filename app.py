@@ -1,27 +1,23 @@
-# --- SYSTEM CHECK START ---
+# Heavy SDKs (yt-dlp, google-genai, groq, edge-tts) load lazily or from
+# prewarm() after startup; GET /ready reports what is actually available.
 print("--- RECAP MAKER SYSTEM STARTING ---")
-try:
-    import flask
-    from flask import Flask, render_template, request, jsonify, session, send_file, after_this_request
-    import yt_dlp
-    import ffmpeg
-    import edge_tts
-    import speech_recognition
-    import groq
-    import queue
-    print("✅ All Libraries Loaded Successfully!")
-except ImportError as e:
-    print(f"❌ CRITICAL ERROR: Missing Library -> {e}")
-    exit()
-# --- SYSTEM CHECK END ---
+from flask import Flask, Response, render_template, request, jsonify, session, send_file
 
 import os
+import json
+import shutil
+import hashlib
 import uuid
 import logging
 import threading
 import time
 from werkzeug.utils import secure_filename
-from utils import process_video_edit, create_ai_audio, analyze_script_with_ai
+from utils import process_video_edit, create_ai_audio, script_slice, analyze_script_with_ai, analysis_cache, tts_cache, get_gemini_manager, probe_cache, probe_media, is_analysis_error, prewarm, load_gemini_keys, groq_api_key, WARM_STATUS, PREVIEW_SECONDS, ENCODER_PROFILES
+from ai_cache import video_id_cache_key, file_cache_key
+from job_store import JobStore
+from storage import StorageManager
+from metrics import metrics
+from probe_cache import media_info
 
 # Disable heavy logging
 log = logging.getLogger('werkzeug')
@@ -30,6 +26,9 @@ log.setLevel(logging.ERROR)
 BASE_DIR = os.path.abspath(os.path.dirname(__file__))
 app = Flask(__name__, template_folder=BASE_DIR)
 app.secret_key = os.environ.get('SECRET_KEY', 'secure-recap-maker-key')
+# Behind nginx/Apache, let the proxy stream files (X-Sendfile) instead of Python. This is the only
+# zero-copy path for /media: Werkzeug serves Range (206) bodies by reading chunks in Python.
+app.use_x_sendfile = os.environ.get('USE_X_SENDFILE') == '1'
 
 # --- CONFIG ---
 UPLOAD_FOLDER = os.path.join(BASE_DIR, 'static', 'uploads')
@@ -38,69 +37,336 @@ PROCESSED_FOLDER = os.path.join(BASE_DIR, 'static', 'processed')
 for f in [UPLOAD_FOLDER, PROCESSED_FOLDER]:
     os.makedirs(f, exist_ok=True)
 
-# --- QUEUE SYSTEM ---
-task_queue = queue.Queue()
-jobs = {} 
+# --- RENDER POOL CONFIG ---
+# Each render is its own ffmpeg process, so size the pool by how many
+# per-job thread budgets fit on the host instead of rendering one at a time.
+# With several gunicorn processes the host budget is split between them.
+CPU_COUNT = os.cpu_count() or 1
+WEB_CONCURRENCY = max(1, int(os.environ.get('WEB_CONCURRENCY', 1)))
+FFMPEG_THREADS = int(os.environ.get('FFMPEG_THREADS', 0))
+RENDER_WORKERS = int(os.environ.get('RENDER_WORKERS', 0)) or max(1, CPU_COUNT // (FFMPEG_THREADS or 4) // WEB_CONCURRENCY)
+FFMPEG_THREADS = FFMPEG_THREADS or max(1, CPU_COUNT // (RENDER_WORKERS * WEB_CONCURRENCY))
+ANALYSIS_WORKERS = int(os.environ.get('ANALYSIS_WORKERS', 2))
+DEFAULT_RENDER_SECONDS = 90.0
+POLL_INTERVAL = 1.0
+PROGRESS_MIN_INTERVAL = 1.0
+PREVIEW_PRIORITY = 10
+MAX_UPLOAD_BYTES = int(os.environ.get('MAX_UPLOAD_MB', 8192)) * 1024 * 1024
+CLEANUP_INTERVAL = int(os.environ.get('CLEANUP_INTERVAL', 300))
+MEDIA_TOUCH_INTERVAL = 60
+JOB_RETENTION = int(os.environ.get('JOB_RETENTION', 7 * 86400))
+UPLOAD_TTL = int(os.environ.get('UPLOAD_TTL', 1800))
+OUTPUT_TTL = int(os.environ.get('OUTPUT_TTL', 7200))
+PROBE_CACHE_TTL = 86400
+BATCH_MAX_ITEMS = int(os.environ.get('BATCH_MAX_ITEMS', 50))
+UPLOAD_WRITE_LEASE = 30
+UPLOAD_VERIFY_STALE = 600
+UPLOAD_VERIFY_WAIT = 60
+UPLOAD_CHUNK_MAX = int(os.environ.get('UPLOAD_CHUNK_MAX_MB', 64)) * 1024 * 1024
+SSE_INTERVAL = 1.0
+SSE_KEEPALIVE_SECONDS = 15
+# Each open stream holds a gunicorn thread, so streams are short and the browser reconnects
+SSE_MAX_SECONDS = int(os.environ.get('SSE_MAX_SECONDS', 30))
+SSE_RETRY_MS = 1000
 
-# --- WORKER 1: VIDEO PROCESSING ---
-def worker():
-    print("👷 Video Processing Worker Started...")
+# Downloads/analyses run on their own pool so a long yt-dlp fetch never holds a render slot
+POOLS = {
+    'render': {'kinds': ('render',), 'workers': RENDER_WORKERS},
+    'analysis': {'kinds': ('download', 'analyze'), 'workers': ANALYSIS_WORKERS},
+}
+POOL_OF_KIND = {k: name for name, p in POOLS.items() for k in p['kinds']}
+
+# --- QUEUE SYSTEM (DURABLE) ---
+JOB_DB_PATH = os.environ.get('JOB_DB_PATH', os.path.join(BASE_DIR, 'data', 'jobs.db'))
+job_store = JobStore(JOB_DB_PATH, lease_seconds=int(os.environ.get('JOB_LEASE_SECONDS', 60)), express_priority=PREVIEW_PRIORITY)
+STORAGE_BUDGET = int(os.environ.get('STORAGE_BUDGET_MB', 0)) * 1024 * 1024 or int(shutil.disk_usage(UPLOAD_FOLDER).total * 0.8)
+storage = StorageManager(JOB_DB_PATH, {UPLOAD_FOLDER: UPLOAD_TTL, PROCESSED_FOLDER: OUTPUT_TTL}, STORAGE_BUDGET)
+metrics.bind(JOB_DB_PATH)
+PROCESS_TAG = f"{os.uname().nodename if hasattr(os, 'uname') else 'host'}:{os.getpid()}"
+running_jobs = {}       # job_id -> start timestamp (this process only)
+queue_lock = threading.Lock()
+job_wakeup = {name: threading.Event() for name in POOLS}
+
+def estimate_queue_position(job_id):
+    """Returns (position, estimated_start_seconds) for a queued job or (None, None)."""
+    kind, position = job_store.queue_position(job_id, {k: POOLS[p]['kinds'] for k, p in POOL_OF_KIND.items()})
+    if position is None: return None, None
+    pool = POOLS[POOL_OF_KIND.get(kind, 'render')]
+    avg = job_store.average_duration(pool['kinds']) or DEFAULT_RENDER_SECONDS
+    now = time.time()
+    workers = max(1, pool['workers'] * WEB_CONCURRENCY)
+    # Time until each worker slot is free, then hand out jobs ahead of us in order
+    slots = [max(0.0, avg - (now - started)) for started in job_store.running_started(pool['kinds'])]
+    slots += [0.0] * max(0, workers - len(slots))
+    slots = sorted(slots)[:workers]
+    for _ in range(position):
+        slots[0] += avg
+        slots.sort()
+    return position, round(slots[0], 1)
+
+def enqueue_job(job_id, payload, kind='render', priority=0, dedup_key=None, files=(), user_id=None):
+    """Queues a job; `files` stay pinned against eviction until it finishes."""
+    storage.reference(job_id, files)
+    job_store.create(job_id, payload, kind=kind, priority=priority, dedup_key=dedup_key,
+                     batch_id=payload.get('batch_id'), user_id=user_id)
+    job_wakeup[POOL_OF_KIND[kind]].set()
+
+def render_dedup_key(input_path, opts):
+    """Hash of (source content, render options, logo content, voice script) for a render request."""
+    h = hashlib.sha256()
+    h.update(file_cache_key(input_path).encode())
+    h.update(json.dumps({k: v for k, v in opts.items() if k != 'logo_path'}, sort_keys=True, ensure_ascii=False).encode())
+    if opts.get('logo_path'): h.update(file_cache_key(opts['logo_path']).encode())
+    return h.hexdigest()
+
+def progress_reporter(job_id):
+    """Callback for handlers: progress(stage, percent=None). Throttled so hooks can call it per chunk."""
+    last = {'at': 0.0, 'stage': None}
+    def progress(stage, percent=None, **extra):
+        now = time.time()
+        if stage == last['stage'] and now - last['at'] < PROGRESS_MIN_INTERVAL: return
+        last['at'], last['stage'] = now, stage
+        info = {'stage': stage}
+        if percent is not None: info['percent'] = round(float(percent), 1)
+        info.update(extra)
+        try: job_store.update_progress(job_id, info)
+        except Exception as e: print(f"⚠️ Progress Update Error: {e}")
+    return progress
+
+# --- JOB HANDLERS ---
+# Each returns (status, result) where result is merged into /status output.
+def run_render_job(job_id, payload, progress):
+    input_p, output_p, opts = payload['input'], payload['output'], payload['opts']
+    ap = os.path.join(UPLOAD_FOLDER, f"audio_{job_id}.mp3")
+    # Indexed and pinned before any bytes are written, so a failed or crashed render's partial files
+    # expire by TTL (reconcile() picks up their real size) instead of sitting outside the budget
+    outputs = [output_p, ap] if opts.get('ai_text') else [output_p]
+    storage.reference(job_id, outputs)
+    for p in outputs: storage.register(p, owner_job=job_id)
+    try: return _render(job_id, input_p, output_p, ap, opts, progress)
+    finally:
+        for p in outputs:
+            if os.path.exists(p): storage.register(p, owner_job=job_id)
+            else: storage.forget(p)
+
+def _render(job_id, input_p, output_p, ap, opts, progress):
+    if opts.get('ai_text'):
+        progress('synthesizing', 0)
+        text = opts['ai_text']
+        duration = probe_media(input_p)['duration'] if opts.get('preview') else 0
+        if duration:
+            # Previews voice only the sentences under the window; the full render reuses their cached segments
+            start = float(opts['preview'].get('start', 0))
+            end = start + float(opts['preview'].get('duration', PREVIEW_SECONDS))
+            text, opts['ai_audio_span'] = script_slice(text, start / duration, end / duration)
+        if create_ai_audio(text, ap, opts.get('voice_gender', 'male'), progress=progress):
+            opts['ai_audio_path'] = ap
+    progress('rendering', 0)
+    success, err_msg = process_video_edit(input_p, output_p, opts, threads=FFMPEG_THREADS, progress=progress)
+    if success:
+        filename = os.path.basename(output_p)
+        return 'success', {'url': f"/media/{filename}"}
+    return 'failed', {'message': f'Rendering Failed: {err_msg}'}
+
+def run_download_job(job_id, payload, progress):
+    secure_uuid = payload['uuid']
+
+    def hook(d):
+        if d.get('status') == 'downloading':
+            total = d.get('total_bytes') or d.get('total_bytes_estimate')
+            pct = (d.get('downloaded_bytes', 0) * 100.0 / total) if total else None
+            progress('downloading', pct)
+
+    # --- FINAL YOUTUBE ANTI-BOT BYPASS (TV CLIENT) ---
+    # /download-video only transcribes, so audio is enough; batch items that feed a render set payload['format']
+    opts = {
+        'outtmpl': os.path.join(UPLOAD_FOLDER, f'vid_{secure_uuid}.%(ext)s'),
+        'format': payload.get('format') or 'm4a/bestaudio/best', 
+        'noplaylist': True, 
+        'quiet': True,
+        'nocheckcertificate': True,
+        # TV Client အနေနဲ့ ဝင်ဆွဲပါမည်
+        'extractor_args': {'youtube': {'player_client': ['tv', 'mweb']}},
+        'progress_hooks': [hook],
+    }
+    if payload.get('format'): opts['merge_output_format'] = 'mp4'
+    progress('downloading', 0)
+    import yt_dlp  # usually already loaded by prewarm()
+    with metrics.span('download'), yt_dlp.YoutubeDL(opts) as ydl:
+        info = ydl.extract_info(payload['url'], download=True)
+        
+    target_prefix = f"vid_{secure_uuid}"
+    f = next((x for x in os.listdir(UPLOAD_FOLDER) if x.startswith(target_prefix)), None)
+    if not f: return 'failed', {'message': 'Download failed'}
+
+    path = os.path.join(UPLOAD_FOLDER, f)
+    storage.reference(job_id, [path])
+    storage.register(path, owner_job=job_id)
+    # Same video re-downloaded -> same cache entry, regardless of URL form
+    cache_key = video_id_cache_key(info.get('extractor_key', ''), info['id']) if info and info.get('id') else None
+    media = probe_upload(path)
+    txt = analyze_script_with_ai(path, cache_key=cache_key, progress=progress)
+    return 'success', {'filename': f, 'path': f'/static/uploads/{f}', 'translated_text': txt, 'media': media}
+
+def run_analyze_job(job_id, payload, progress):
+    path = os.path.join(UPLOAD_FOLDER, payload['filename'])
+    if not os.path.exists(path): return 'failed', {'message': 'File not found (Expired)'}
+    txt = analyze_script_with_ai(path, progress=progress)
+    return 'success', {'translated_text': txt}
+
+JOB_HANDLERS = {
+    'render': run_render_job,
+    'download': run_download_job,
+    'analyze': run_analyze_job,
+}
+
+# --- BATCH PIPELINE ---
+# A batch item is a chain of jobs linked through payload['then']: a download
+# or analysis job, then a render that voices the translation. Stages of one
+# item run in order; items overlap freely because downloads/analyses and
+# renders drain separate pools (item N+1 downloads while item N renders).
+def enqueue_next_stage(parent_id, payload, result):
+    nxt = payload['then']
+    job_id = uuid.uuid4().hex
+    filename = result.get('filename') or payload.get('filename')
+    ip = os.path.join(UPLOAD_FOLDER, filename)
+    opts = dict(nxt['opts'])
+    text = result.get('translated_text') or ''
+    if nxt.get('voice'):
+        opts['ai_text'] = text
+        opts['voice_gender'] = nxt.get('voice_gender', 'male')
+    media = result.get('media') if 'media' in result else {'has_video': True}  # filename items were checked by create_batch
+    job = {'kind': 'render', 'input': ip, 'output': os.path.join(PROCESSED_FOLDER, f"recap_{job_id}.mp4"), 'opts': opts,
+           'batch_id': payload['batch_id'], 'item': payload['item'], 'source': payload['source'],
+           'stage': payload['stage'] + 1, 'stages': payload['stages'], 'parent': parent_id}
+    # Record the render stage as failed instead of queueing a render that cannot succeed
+    failure = None
+    if not (media or {}).get('has_video'): failure = 'Render Skipped: the download has no readable video stream'
+    elif nxt.get('voice') and is_analysis_error(text): failure = f'Analysis Failed: {text[:200]}'
+    if failure:
+        job_store.create(job_id, job, kind='render', batch_id=payload['batch_id'], user_id=payload.get('user_id'),
+                         status='failed', result={'message': failure})
+        return
+    enqueue_job(job_id, job, kind='render', priority=payload.get('priority', 0),
+                files=[ip, opts.get('logo_path')], user_id=payload.get('user_id'))
+
+def batch_status_payload(batch_id):
+    """Per-item stage/progress plus an aggregate, from every job in the batch."""
+    jobs = job_store.batch_jobs(batch_id)
+    if not jobs: return {'status': 'not_found'}
+    latest = {}
+    for job in jobs: latest[job['payload']['item']] = job  # later stages replace earlier ones
+    items, fractions = [], []
+    for index in sorted(latest):
+        job = latest[index]
+        p, status = job['payload'], job['status']
+        stage, stages = p['stage'], p['stages']
+        percent = job['progress'].get('percent') or 0
+        if status == 'success' and stage < stages: status = 'processing'  # next stage not queued yet
+        done = stage if job['status'] == 'success' else stage - 1 + (percent / 100.0 if status == 'processing' else 0)
+        fractions.append(1.0 if status == 'failed' else done / stages)
+        item = {'index': index, 'source': p['source'], 'job_id': job['id'], 'kind': job['kind'], 'status': status,
+                'stage': stage, 'stages': stages}
+        if status == 'processing' and job['progress']: item['progress'] = job['progress']
+        if status in ('success', 'failed'): item.update(job['result'])
+        items.append(item)
+    counts = {s: sum(1 for i in items if i['status'] == s) for s in ('queued', 'processing', 'success', 'failed')}
+    if counts['queued'] == len(items): overall = 'queued'
+    elif counts['queued'] or counts['processing']: overall = 'processing'
+    elif not counts['failed']: overall = 'success'
+    else: overall = 'failed' if not counts['success'] else 'partial'
+    return {'status': overall, 'batch_id': batch_id, 'percent': round(sum(fractions) * 100.0 / len(items), 1),
+            'counts': counts, 'items': items}
+
+# --- WORKER 1: JOB POOLS ---
+def worker(pool_name, worker_no):
+    print(f"👷 {pool_name.title()} Worker #{worker_no} Started...")
+    worker_id = f"{PROCESS_TAG}:{pool_name}:{worker_no}"
+    kinds, wakeup = POOLS[pool_name]['kinds'], job_wakeup[pool_name]
     while True:
+        job_id = None
         try:
-            job_id, input_p, output_p, opts = task_queue.get()
-            print(f"⚙️ Worker: Starting Job {job_id}")
-            jobs[job_id]['status'] = 'processing'
+            claimed = job_store.claim(worker_id, kinds)
+            if not claimed:
+                wakeup.wait(POLL_INTERVAL)
+                wakeup.clear()
+                continue
+            job_id, payload = claimed
+            kind = payload.get('kind', 'render')
+            print(f"⚙️ {pool_name.title()} Worker #{worker_no}: Starting {kind} Job {job_id}")
+            with queue_lock: running_jobs[job_id] = time.time()
             
-            success, err_msg = process_video_edit(input_p, output_p, opts)
+            started = time.perf_counter()
+            status, result = JOB_HANDLERS[kind](job_id, payload, progress_reporter(job_id))
+            # Queue the batch item's next stage before finishing, so its files never go unpinned
+            if status == 'success' and payload.get('then'): enqueue_next_stage(job_id, payload, result)
+            job_store.finish(job_id, status, result)
+            metrics.observe('recap_job_seconds', time.perf_counter() - started, kind=kind, status=status)
+            metrics.inc('recap_jobs_total', kind=kind, status=status)
             
-            if success:
-                filename = os.path.basename(output_p)
-                download_url = f"/stream-and-delete/{filename}"
-                jobs[job_id] = {'status': 'success', 'url': download_url}
-                print(f"✅ Job {job_id} Complete!")
-            else:
-                jobs[job_id] = {'status': 'failed', 'message': f'Rendering Failed: {err_msg}'}
-                print(f"❌ Job {job_id} Failed! Reason: {err_msg}")
-
-            task_queue.task_done()
+            if status == 'success': print(f"✅ Job {job_id} Complete!")
+            else: print(f"❌ Job {job_id} Failed! Reason: {result.get('message')}")
         except Exception as e:
             print(f"Worker Crash: {e}")
-            if 'job_id' in locals():
-                jobs[job_id] = {'status': 'failed', 'message': str(e)}
+            if job_id:
+                try: job_store.finish(job_id, 'failed', {'message': str(e)})
+                except Exception as e2: print(f"⚠️ Job Store Error: {e2}")
+                metrics.inc('recap_jobs_total', kind=kind, status='crashed')
+            time.sleep(POLL_INTERVAL)
+        finally:
+            if job_id:
+                with queue_lock: running_jobs.pop(job_id, None)
 
-# --- WORKER 2: AUTO CLEANUP ---
-def cleanup_worker():
-    print("🧹 Auto Cleanup Worker Started...")
+# --- WORKER 1B: LEASE KEEPER ---
+def lease_worker():
+    """Renews leases for this process's jobs and re-queues jobs orphaned by dead processes."""
+    interval = max(1, job_store.lease_seconds // 3)
     while True:
         try:
-            time.sleep(600)
-            now = time.time()
-            cutoff = 1800 
-            
-            folders = [UPLOAD_FOLDER, PROCESSED_FOLDER]
-            deleted_count = 0
-            
-            for folder in folders:
-                if not os.path.exists(folder): continue
-                for filename in os.listdir(folder):
-                    file_path = os.path.join(folder, filename)
-                    if not os.path.isfile(file_path) or filename.startswith('.'): continue
-                    
-                    try:
-                        file_age = now - os.path.getmtime(file_path)
-                        if file_age > cutoff:
-                            os.remove(file_path)
-                            deleted_count += 1
-                    except Exception as e:
-                        print(f"⚠️ Cleanup Access Error: {filename} - {e}")
-            
+            with queue_lock: active = list(running_jobs)
+            job_store.heartbeat(active, PROCESS_TAG + ':')
+            requeued = job_store.requeue_interrupted()
+            if requeued:
+                print(f"♻️ Re-queued {requeued} interrupted job(s).")
+                for event in job_wakeup.values(): event.set()
+            metrics.flush()
+        except Exception as e:
+            print(f"Lease Loop Error: {e}")
+        time.sleep(interval)
+
+# --- WORKER 2: STORAGE MANAGER ---
+# Index-driven: TTL expiry (since last access) and LRU eviction under
+# STORAGE_BUDGET_MB, skipping files that queued/processing jobs still use;
+# the probe and TTS caches and finished job rows are expired on the same tick.
+def storage_worker():
+    print("🧹 Storage Manager Started...")
+    while True:
+        try:
+            # Every tick, not just at startup: files nobody registered (yt-dlp .part/.ytdl leftovers) get indexed and age out
+            storage.reconcile()
+        except Exception as e:
+            print(f"Storage Reconcile Error: {e}")
+        try:
+            deleted_count = storage.evict() + probe_cache.prune(PROBE_CACHE_TTL) + tts_cache.maybe_evict(force=True)
             if deleted_count > 0:
                 print(f"🗑️ Cleaned up {deleted_count} old files.")
+            pruned_rows = job_store.prune(JOB_RETENTION, upload_idle=UPLOAD_TTL)
+            if pruned_rows > 0:
+                print(f"🗑️ Pruned {pruned_rows} finished jobs/uploads.")
         except Exception as e:
             print(f"Cleanup Loop Error: {e}")
+        time.sleep(CLEANUP_INTERVAL)
 
-threading.Thread(target=worker, daemon=True).start()
-threading.Thread(target=cleanup_worker, daemon=True).start()
+WORKER_THREADS = {name: [] for name in POOLS}
+for pool_name, pool in POOLS.items():
+    for n in range(1, pool['workers'] + 1):
+        t = threading.Thread(target=worker, args=(pool_name, n), daemon=True)
+        t.start()
+        WORKER_THREADS[pool_name].append(t)
+threading.Thread(target=lease_worker, daemon=True).start()
+print(f"🏭 Render Pool: {RENDER_WORKERS} workers x {FFMPEG_THREADS} ffmpeg threads ({CPU_COUNT} cores), Analysis Pool: {ANALYSIS_WORKERS} workers")
+threading.Thread(target=storage_worker, daemon=True).start()
+if os.environ.get('PREWARM', '1') != '0': prewarm(extra=('yt_dlp',))
 
 # --- HELPER: GET USER ID ---
 def get_user_id():
@@ -115,26 +381,32 @@ def home():
     uid = get_user_id()
     return render_template('index.html', user_id=uid)
 
-@app.route('/stream-and-delete/<filename>')
-def stream_and_delete(filename):
+@app.route('/media/<filename>')
+@app.route('/stream-and-delete/<filename>')  # old URL; no longer deletes on first byte
+def stream_media(filename):
+    """Range-aware (206) delivery of a processed output. Bodies are read and written by Python
+    (full 200s may use the server's sendfile) unless USE_X_SENDFILE hands them to the proxy."""
     try:
-        path = os.path.join(PROCESSED_FOLDER, filename)
-        if not os.path.exists(path):
+        path = os.path.join(PROCESSED_FOLDER, secure_filename(filename))
+        if not os.path.isfile(path):
             return jsonify({'status': 'error', 'message': 'File not found or expired'}), 404
 
-        @after_this_request
-        def remove_file(response):
-            try:
-                if os.path.exists(path):
-                    os.remove(path)
-            except Exception as e:
-                print(f"⚠️ Error deleting {filename}: {e}")
-            return response
-
-        return send_file(path, as_attachment=False)
+        # Reads restart the retention clock, at most one index write per file per minute
+        storage.touch(path, min_interval=MEDIA_TOUCH_INTERVAL)
+        return send_file(path, mimetype='video/mp4', conditional=True, max_age=OUTPUT_TTL,
+                         as_attachment=request.args.get('download') == '1', download_name=filename)
     except Exception as e:
         return jsonify({'status': 'error', 'message': str(e)}), 500
 
+def probe_upload(path):
+    """Probes a new source once (cached for every later render) and starts its keyframe index. None if unreadable."""
+    try: meta = probe_media(path)
+    except Exception as e:
+        print(f"⚠️ Probe Error: {e}")
+        return None
+    if meta['has_video']: probe_cache.warm(path)
+    return media_info(meta)
+
 @app.route('/upload-video', methods=['POST'])
 def up_video():
     try:
@@ -151,47 +423,189 @@ def up_video():
         
         path = os.path.join(UPLOAD_FOLDER, safe_name)
         f.save(path)
+        storage.register(path)
         
         return jsonify({
             'status':'success', 
             'filename':safe_name, 
             'path':f'/static/uploads/{safe_name}', 
-            'translated_text': ''
+            'translated_text': '',
+            'media': probe_upload(path)
         })
     except Exception as e: 
         print(f"Upload Error: {e}")
         return jsonify({'status':'error', 'message':str(e)})
 
+# --- RESUMABLE CHUNKED UPLOADS ---
+# POST /upload/init {filename, size, chunk_size, sha256?} -> upload_id
+# PUT  /upload/<id>  body=bytes, header Upload-Offset (+ optional X-Chunk-Sha256)
+# GET  /upload/<id>  -> received offset, so a dropped client can resume
+# POST /upload/<id>/complete {digest} -> same response as /upload-video
+# Bytes are streamed from the socket into <final name>.part, never spooled to a temp file.
+# One request at a time holds an upload's write slot (a lease renewed as bytes
+# arrive), and a failed chunk never truncates, so a stalled PUT can't clobber
+# what its retry already committed. /complete re-hashes the file on disk:
+# digest = sha256 of the concatenated hex sha256s of each chunk_size chunk.
+def upload_part_path(upload):
+    return os.path.join(UPLOAD_FOLDER, upload['filename'] + '.part')
+
+def upload_state(upload):
+    return {'status': 'success', 'upload_id': upload['id'], 'size': upload['size'], 'chunk_size': upload['chunk_size'],
+            'received': upload['received'], 'complete': upload['status'] == 'complete'}
+
+def chunked_digest(path, chunk_size):
+    """sha256 over the hex sha256 of each chunk_size piece: what the browser can compute chunk by chunk."""
+    outer = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            outer.update(hashlib.sha256(chunk).hexdigest().encode())
+    return outer.hexdigest()
+
+@app.route('/upload/init', methods=['POST'])
+def upload_init():
+    try:
+        d = request.get_json(silent=True) or {}
+        name, size = d.get('filename') or '', int(d.get('size') or 0)
+        chunk_size = int(d.get('chunk_size') or 0)
+        if size <= 0: return jsonify({'status':'error', 'message': 'Invalid size'}), 400
+        if not 0 < chunk_size <= UPLOAD_CHUNK_MAX: return jsonify({'status':'error', 'message': 'Invalid chunk_size'}), 400
+        if size > MAX_UPLOAD_BYTES: return jsonify({'status':'error', 'message': 'File too large'}), 413
+        
+        ext = secure_filename(name).rsplit('.', 1)[1].lower() if '.' in secure_filename(name) else 'mp4'
+        safe_name = f"vid_{uuid.uuid4().hex}.{ext}"
+        upload_id = uuid.uuid4().hex
+        sha = (d.get('sha256') or '').lower() or None
+        job_store.create_upload(upload_id, safe_name, size, sha, chunk_size)
+        part = os.path.join(UPLOAD_FOLDER, safe_name + '.part')
+        open(part, 'wb').close()
+        storage.register(part, size=size)  # reserve the full size against the budget
+        return jsonify(upload_state(job_store.get_upload(upload_id)))
+    except Exception as e: return jsonify({'status':'error', 'message':str(e)}), 500
+
+@app.route('/upload/<upload_id>', methods=['GET'])
+def upload_status(upload_id):
+    upload = job_store.get_upload(upload_id)
+    if not upload: return jsonify({'status':'not_found'}), 404
+    return jsonify(upload_state(upload))
+
+@app.route('/upload/<upload_id>', methods=['PUT'])
+def upload_chunk(upload_id):
+    try:
+        upload = job_store.get_upload(upload_id)
+        if not upload: return jsonify({'status':'not_found'}), 404
+        if upload['status'] != 'open': return jsonify(upload_state(upload)), 409
+        
+        try: offset = int(request.headers.get('Upload-Offset', request.args.get('offset', -1)))
+        except ValueError: return jsonify({'status':'error', 'message': 'Invalid Upload-Offset'}), 400
+        length = request.content_length or 0
+        if offset != upload['received']:
+            # Client is out of sync (e.g. retried a chunk that already landed): tell it where to resume
+            return jsonify(dict(upload_state(upload), message='Offset mismatch')), 409
+        chunk = upload['chunk_size'] or UPLOAD_CHUNK_MAX
+        if length <= 0 or length > chunk or offset % chunk or (length != chunk and offset + length != upload['size']) \
+                or offset + length > upload['size']:
+            return jsonify({'status':'error', 'message': 'Invalid chunk length'}), 400
+
+        path = upload_part_path(upload)
+        if not os.path.exists(path):
+            job_store.set_upload_status(upload_id, 'expired')
+            return jsonify({'status':'error', 'message': 'Upload expired, start again'}), 410
+        token = uuid.uuid4().hex
+        if not job_store.claim_upload_write(upload_id, offset, token, UPLOAD_WRITE_LEASE):
+            return jsonify(dict(upload_state(job_store.get_upload(upload_id)), message='Chunk in progress')), 409
+        try:
+            h = hashlib.sha256()
+            written = 0
+            with open(path, 'r+b') as out:
+                out.seek(offset)
+                while written < length:
+                    buf = request.stream.read(min(1024 * 1024, length - written))
+                    if not buf: break
+                    # Check the slot before every write: once a retry owns it, this request must not touch the file
+                    if not job_store.renew_upload_write(upload_id, token, UPLOAD_WRITE_LEASE):
+                        return jsonify(dict(upload_state(job_store.get_upload(upload_id)), message='Superseded')), 409
+                    out.write(buf)
+                    h.update(buf)
+                    written += len(buf)
+                expected = (request.headers.get('X-Chunk-Sha256') or '').lower()
+                if written != length or (expected and expected != h.hexdigest()):
+                    # No truncate: bytes past `received` are simply overwritten by the resend
+                    return jsonify(dict(upload_state(upload), status='error', message='Chunk incomplete or checksum mismatch')), 400
+                out.flush()
+                os.fsync(out.fileno())
+            storage.touch(path)
+            if not job_store.advance_upload(upload_id, offset, offset + written, token):
+                return jsonify(dict(upload_state(job_store.get_upload(upload_id)), message='Concurrent write')), 409
+        finally:
+            job_store.release_upload_write(upload_id, token)  # no-op once advance_upload freed it
+        return jsonify(upload_state(job_store.get_upload(upload_id)))
+    except Exception as e: return jsonify({'status':'error', 'message':str(e)}), 500
+
+@app.route('/upload/<upload_id>/complete', methods=['POST'])
+def upload_complete(upload_id):
+    try:
+        upload = job_store.get_upload(upload_id)
+        if not upload: return jsonify({'status':'not_found'}), 404
+        safe_name = upload['filename']
+        final = os.path.join(UPLOAD_FOLDER, safe_name)
+        if upload['status'] != 'complete':
+            if upload['received'] != upload['size']:
+                return jsonify(dict(upload_state(upload), status='error', message='Upload incomplete')), 409
+            part = upload_part_path(upload)
+            digest = ((request.get_json(silent=True) or {}).get('digest') or '').lower()
+            if not (upload['sha256'] or (digest and upload['chunk_size'])):
+                return jsonify({'status':'error', 'message':'Missing file digest'}), 400
+            if job_store.begin_upload_verify(upload_id, UPLOAD_VERIFY_STALE):
+                try:
+                    if upload['sha256']:
+                        h = hashlib.sha256()
+                        with open(part, 'rb') as f:
+                            for buf in iter(lambda: f.read(4 * 1024 * 1024), b''): h.update(buf)
+                        ok = h.hexdigest() == upload['sha256']
+                    else:
+                        ok = chunked_digest(part, upload['chunk_size']) == digest
+                    if ok:
+                        os.replace(part, final)
+                        storage.rename(part, final)
+                except Exception:
+                    job_store.set_upload_status(upload_id, 'open')  # let the client call /complete again
+                    raise
+                if not ok:
+                    job_store.set_upload_status(upload_id, 'failed')
+                    os.remove(part)
+                    storage.forget(part)
+                    return jsonify({'status':'error', 'message':'Checksum mismatch'}), 400
+                job_store.set_upload_status(upload_id, 'complete')
+            else:
+                # A concurrent /complete (e.g. a client retry) is verifying: answer with its outcome
+                deadline = time.time() + UPLOAD_VERIFY_WAIT
+                while upload['status'] == 'verifying' and time.time() < deadline:
+                    time.sleep(0.5)
+                    upload = job_store.get_upload(upload_id)
+                if upload['status'] == 'failed': return jsonify({'status':'error', 'message':'Checksum mismatch'}), 400
+                if upload['status'] != 'complete':
+                    return jsonify(dict(upload_state(upload), status='error', message='Upload not verified')), 409
+
+        return jsonify({
+            'status':'success', 
+            'filename':safe_name, 
+            'path':f'/static/uploads/{safe_name}', 
+            'translated_text': '',
+            'media': probe_upload(final)
+        })
+    except Exception as e:
+        print(f"Upload Error: {e}")
+        return jsonify({'status':'error', 'message':str(e)}), 500
+
 @app.route('/download-video', methods=['POST'])
 def dl_video():
     try:
         url = request.json.get('url')
         if not url: return jsonify({'status':'error', 'message': 'No URL'})
         
-        secure_uuid = uuid.uuid4().hex
-        
-        # --- FINAL YOUTUBE ANTI-BOT BYPASS (TV CLIENT) ---
-        opts = {
-            'outtmpl': os.path.join(UPLOAD_FOLDER, f'vid_{secure_uuid}.%(ext)s'),
-            'format': 'm4a/bestaudio/best', 
-            'noplaylist': True, 
-            'quiet': True,
-            'nocheckcertificate': True,
-            # TV Client အနေနဲ့ ဝင်ဆွဲပါမည်
-            'extractor_args': {'youtube': {'player_client': ['tv', 'mweb']}},
-        }
-        
-        with yt_dlp.YoutubeDL(opts) as ydl:
-            ydl.download([url])
-            
-        target_prefix = f"vid_{secure_uuid}"
-        f = next((x for x in os.listdir(UPLOAD_FOLDER) if x.startswith(target_prefix)), None)
-        
-        if f:
-            path = os.path.join(UPLOAD_FOLDER, f)
-            txt = analyze_script_with_ai(path)
-            return jsonify({'status':'success', 'filename':f, 'path':f'/static/uploads/{f}', 'translated_text':txt})
-        return jsonify({'status':'error', 'message': 'Download failed'})
+        job_id = uuid.uuid4().hex
+        enqueue_job(job_id, {'kind': 'download', 'url': url, 'uuid': uuid.uuid4().hex}, kind='download', user_id=get_user_id())
+        return jsonify({'status':'queued', 'job_id': job_id, 'message': 'Download Queued'})
     except Exception as e: return jsonify({'status':'error', 'message':str(e)})
 
 @app.route('/re-analyze', methods=['POST'])
@@ -200,16 +614,39 @@ def re_analyze():
         filename = request.form.get('filename')
         
         if not filename: return jsonify({'status':'error', 'message':'No file specified'})
+        filename = secure_filename(filename)
         
         path = os.path.join(UPLOAD_FOLDER, filename)
         
         if not os.path.exists(path): 
             return jsonify({'status':'error', 'message':'File not found (Expired)'})
 
-        txt = analyze_script_with_ai(path)
-        return jsonify({'status':'success', 'translated_text': txt})
+        job_id = uuid.uuid4().hex
+        enqueue_job(job_id, {'kind': 'analyze', 'filename': filename}, kind='analyze', files=[path], user_id=get_user_id())
+        return jsonify({'status':'queued', 'job_id': job_id, 'message': 'Analysis Queued'})
     except Exception as e: return jsonify({'status':'error', 'message':str(e)})
 
+def is_on(d, k): return d.get(k) in ['on', 'true', '1', True]
+
+def parse_render_options(d):
+    """Render options from the /process form (or a /batch options template)."""
+    return {
+        'text_watermark': d.get('text_watermark'),
+        'text_x': int(float(d.get('text_x', 10))),  
+        'text_y': int(float(d.get('text_y', 10))),  
+        'blur_enabled': is_on(d, 'blur_enabled'),
+        'blur_x': int(float(d.get('blur_x',0))), 'blur_y': int(float(d.get('blur_y',0))),
+        'blur_w': int(float(d.get('blur_w',0))), 'blur_h': int(float(d.get('blur_h',0))),
+        'logo_x': int(float(d.get('logo_x',1))), 'logo_y': int(float(d.get('logo_y',1))),
+        'logo_w': int(float(d.get('logo_w',100))), 'logo_h': int(float(d.get('logo_h',100))),
+        'bypass_flip': is_on(d, 'bypass_flip'), 
+        'bypass_zoom': is_on(d, 'bypass_zoom'),
+        'bypass_speed': is_on(d, 'bypass_speed'), 
+        'bypass_color': is_on(d, 'bypass_color'),
+        'monezlation': is_on(d, 'monezlation'),
+        'encoder_profile': d.get('encoder_profile') if d.get('encoder_profile') in ENCODER_PROFILES else None,
+    }
+
 @app.route('/process', methods=['POST'])
 def start_process():
     try:
@@ -224,51 +661,187 @@ def start_process():
             return jsonify({'status':'error', 'message':'Source video not found (Expired)'})
 
         job_id = uuid.uuid4().hex
-        op = os.path.join(PROCESSED_FOLDER, f"recap_{job_id}.mp4")
-        
-        def is_on(k): return d.get(k) in ['on', 'true', '1']
-        
-        opts = {
-            'text_watermark': d.get('text_watermark'),
-            'text_x': int(float(d.get('text_x', 10))),  
-            'text_y': int(float(d.get('text_y', 10))),  
-            'blur_enabled': is_on('blur_enabled'),
-            'blur_x': int(float(d.get('blur_x',0))), 'blur_y': int(float(d.get('blur_y',0))),
-            'blur_w': int(float(d.get('blur_w',0))), 'blur_h': int(float(d.get('blur_h',0))),
-            'logo_x': int(float(d.get('logo_x',1))), 'logo_y': int(float(d.get('logo_y',1))),
-            'logo_w': int(float(d.get('logo_w',100))), 'logo_h': int(float(d.get('logo_h',100))),
-            'bypass_flip': is_on('bypass_flip'), 
-            'bypass_zoom': is_on('bypass_zoom'),
-            'bypass_speed': is_on('bypass_speed'), 
-            'bypass_color': is_on('bypass_color'),
-            'monezlation': is_on('monezlation'),
-        }
+        preview = is_on(d, 'preview')
+        op = os.path.join(PROCESSED_FOLDER, f"{'preview' if preview else 'recap'}_{job_id}.mp4")
+        opts = parse_render_options(d)
 
         if request.files.get('logo_file'):
             l = request.files['logo_file']
             if l.filename:
                 lp = os.path.join(UPLOAD_FOLDER, f"logo_{job_id}.png")
                 l.save(lp)
+                storage.register(lp, owner_job=job_id)
                 opts['logo_path'] = lp
         
+        # Voice is synthesized by the render worker, not inside this request
         if d.get('ai_text'):
-            ap = os.path.join(UPLOAD_FOLDER, f"audio_{job_id}.mp3")
-            gender = d.get('voice_gender','male')
-            if create_ai_audio(d.get('ai_text'), ap, gender):
-                opts['ai_audio_path'] = ap
+            opts['ai_text'] = d.get('ai_text')
+            opts['voice_gender'] = d.get('voice_gender','male')
+
+        if preview:
+            opts['preview'] = {'start': float(d.get('preview_start', 0) or 0), 'duration': PREVIEW_SECONDS}
+
+        # Identical re-submit -> hand back the existing (or in-flight) render
+        dedup_key = render_dedup_key(ip, opts)
+        existing = job_store.find_by_dedup_key(dedup_key)
+        if existing:
+            ex_id, ex_status, ex_payload = existing
+            if ex_status != 'success' or os.path.exists(ex_payload.get('output', '')):
+                if opts.get('logo_path') and os.path.exists(opts['logo_path']): os.remove(opts['logo_path'])
+                return jsonify({'status':'queued', 'job_id': ex_id, 'message': 'Already Rendered', 'deduplicated': True})
         
-        jobs[job_id] = {'status': 'queued'}
-        task_queue.put((job_id, ip, op, opts))
+        # Previews are express jobs: claimed ahead of every full render, fair share included,
+        # so placement checks come back in seconds
+        enqueue_job(job_id, {'kind': 'render', 'input': ip, 'output': op, 'opts': opts},
+                    priority=PREVIEW_PRIORITY if preview else 0, dedup_key=dedup_key,
+                    files=[ip, opts.get('logo_path')], user_id=get_user_id())
         
         return jsonify({'status':'queued', 'job_id': job_id, 'message': 'Added to Queue'})
         
     except Exception as e: return jsonify({'status':'error', 'message':str(e)})
 
+# --- BATCH API ---
+# POST /batch  {"urls": [...], "filenames": [...], "options": {<same fields as /process>, "ai_voice": true},
+#               "render": true, "priority": 0}
+# (or multipart with that JSON in a 'batch' field plus an optional logo_file)
+# GET  /batch/<batch_id> -> aggregate progress and per-item results
+@app.route('/batch', methods=['POST'])
+def create_batch():
+    try:
+        spec = request.get_json(silent=True) or json.loads(request.form.get('batch') or '{}')
+        template = spec.get('options') or {}
+        sources = [('url', u) for u in spec.get('urls') or [] if u] + [('filename', secure_filename(f)) for f in spec.get('filenames') or [] if f]
+        if not sources: return jsonify({'status':'error', 'message':'No URLs or filenames given'})
+        if len(sources) > BATCH_MAX_ITEMS: return jsonify({'status':'error', 'message':f'At most {BATCH_MAX_ITEMS} items per batch'})
+        render = spec.get('render', True) is not False
+        for kind, value in sources:
+            if kind != 'filename': continue
+            if not os.path.exists(os.path.join(UPLOAD_FOLDER, value)):
+                return jsonify({'status':'error', 'message':f'Source video not found (Expired): {value}'})
+            if render and not (probe_upload(os.path.join(UPLOAD_FOLDER, value)) or {}).get('has_video'):
+                return jsonify({'status':'error', 'message':f'Source has no video stream: {value}'})
+
+        batch_id = uuid.uuid4().hex
+        user_id = get_user_id()
+        # Batches may only be deprioritized (background work); they never outrank normal jobs
+        priority = max(-10, min(int(spec.get('priority', 0)), 0))
+        opts = parse_render_options(template)
+        if request.files.get('logo_file') and request.files['logo_file'].filename:
+            lp = os.path.join(UPLOAD_FOLDER, f"logo_{batch_id}.png")
+            request.files['logo_file'].save(lp)
+            storage.register(lp)
+            opts['logo_path'] = lp
+        then = {'opts': opts, 'voice': is_on(template, 'ai_voice') if 'ai_voice' in template else True,
+                'voice_gender': template.get('voice_gender', 'male')} if render else None
+
+        items = []
+        for index, (kind, value) in enumerate(sources):
+            job_id = uuid.uuid4().hex
+            payload = {'batch_id': batch_id, 'item': index, 'source': value, 'stage': 1, 'stages': 2 if render else 1,
+                       'user_id': user_id, 'priority': priority, 'then': then}
+            if kind == 'url':
+                payload.update(kind='download', url=value, uuid=uuid.uuid4().hex)
+                # The render stage needs picture: best video+audio merged to mp4 (single-file fallback)
+                if render: payload['format'] = 'bv*+ba/b'
+                files = [opts.get('logo_path')]
+            else:
+                payload.update(kind='analyze', filename=value)
+                files = [os.path.join(UPLOAD_FOLDER, value), opts.get('logo_path')]
+            enqueue_job(job_id, payload, kind=payload['kind'], priority=priority, files=files, user_id=user_id)
+            items.append({'index': index, 'source': value, 'job_id': job_id})
+        return jsonify({'status':'queued', 'batch_id': batch_id, 'items': items, 'message': f'{len(items)} items queued'})
+    except Exception as e: return jsonify({'status':'error', 'message':str(e)})
+
+@app.route('/batch/<batch_id>')
+def batch_status(batch_id):
+    return jsonify(batch_status_payload(batch_id))
+
+@app.route('/storage/stats')
+def storage_stats():
+    return jsonify(storage.stats())
+
+@app.route('/ready')
+def ready():
+    """Readiness probe: 200 once renders can run (ffmpeg, job DB, workers); keys and SDK warm-up are reported too."""
+    try: database = job_store.ping()
+    except Exception: database = False
+    workers = {name: sum(t.is_alive() for t in threads) for name, threads in WORKER_THREADS.items()}
+    checks = {
+        'ffmpeg': bool(shutil.which('ffmpeg') and shutil.which('ffprobe')),
+        'database': database,
+        'workers': workers,
+        'api_keys': {'gemini': len(load_gemini_keys()), 'groq': bool(groq_api_key())},
+        'sdks': dict(WARM_STATUS),
+    }
+    ok = checks['ffmpeg'] and database and all(workers.values())
+    return jsonify(dict(checks, status='ready' if ok else 'not_ready')), 200 if ok else 503
+
+@app.route('/metrics')
+def prometheus_metrics():
+    """Prometheus text exposition: stage/job histograms from every process plus live queue gauges."""
+    counts = job_store.live_counts()
+    kinds = list(POOL_OF_KIND)
+    busy = {name: sum(counts.get((k, 'processing'), 0) for k in p['kinds']) for name, p in POOLS.items()}
+    # Every gunicorn process runs its own copy of each pool
+    slots = {name: p['workers'] * WEB_CONCURRENCY for name, p in POOLS.items()}
+    with queue_lock: local_busy = len(running_jobs)
+    gemini = get_gemini_manager().stats()
+    gauges = [
+        ('recap_queue_depth', 'Jobs waiting to be claimed.', [({'kind': k}, counts.get((k, 'queued'), 0)) for k in kinds]),
+        ('recap_jobs_processing', 'Jobs currently being worked on.', [({'kind': k}, counts.get((k, 'processing'), 0)) for k in kinds]),
+        ('recap_worker_slots', 'Worker threads across all processes.', [({'pool': n}, v) for n, v in slots.items()]),
+        ('recap_worker_utilization', 'Busy share of worker slots (0-1).',
+         [({'pool': n}, busy[n] / slots[n] if slots[n] else 0) for n in POOLS]),
+        ('recap_process_jobs_running', 'Jobs running in the process that answered this scrape.', [({}, local_busy)]),
+        ('recap_storage_bytes', 'Bytes held in uploads and outputs.', [({}, storage.total_bytes())]),
+        ('recap_storage_budget_bytes', 'Storage byte budget.', [({}, storage.budget_bytes)]),
+        ('recap_gemini_keys_in_flight', 'Gemini requests in flight per key slot (this process).',
+         [({'key': f"key{i + 1}"}, s['in_flight']) for i, s in enumerate(gemini)]),
+        ('recap_gemini_key_tokens', 'Requests left in each key slot\'s per-minute bucket (this process).',
+         [({'key': f"key{i + 1}"}, s['tokens']) for i, s in enumerate(gemini)]),
+    ]
+    return Response(metrics.render(gauges), mimetype='text/plain; version=0.0.4')
+
+@app.route('/cache-stats')
+def cache_stats():
+    return jsonify(dict(analysis_cache.stats(), probe=probe_cache.stats(), tts=tts_cache.stats()))
+
+def job_status_payload(job_id):
+    job = job_store.get(job_id)
+    if not job: return {'status': 'not_found'}
+    if job.get('status') == 'queued':
+        position, eta = estimate_queue_position(job_id)
+        if position is not None:
+            job.update(queue_position=position, estimated_start=eta)
+    return job
+
 @app.route('/status/<job_id>')
 def check_status(job_id):
-    job = jobs.get(job_id)
-    if not job: return jsonify({'status': 'not_found'})
-    return jsonify(job)
+    return jsonify(job_status_payload(job_id))
+
+@app.route('/events/<job_id>')
+def job_events(job_id):
+    """Server-Sent Events push of the same payload /status returns, sent whenever it changes.
+    Streams end after SSE_MAX_SECONDS with a `timeout` event and the client reopens them, so a
+    watcher only borrows a worker thread briefly instead of pinning it for the whole job."""
+    def stream():
+        last, last_sent, opened = None, 0.0, time.time()
+        yield f"retry: {SSE_RETRY_MS}\n\n"
+        while time.time() - opened < SSE_MAX_SECONDS:
+            job = job_status_payload(job_id)
+            body = json.dumps(job, ensure_ascii=False)
+            now = time.time()
+            if body != last:
+                yield f"data: {body}\n\n"
+                last, last_sent = body, now
+            elif now - last_sent > SSE_KEEPALIVE_SECONDS:
+                yield ": keepalive\n\n"
+                last_sent = now
+            if job['status'] in ('success', 'failed', 'not_found'): return
+            time.sleep(SSE_INTERVAL)
+        yield "event: timeout\ndata: {}\n\n"
+    headers = {'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    return Response(stream(), mimetype='text/event-stream', headers=headers)
 
 if __name__ == '__main__':
     port = int(os.environ.get('PORT', 10000))
@@ -0,0 +1,249 @@
+"""Render/analysis benchmark on synthetic media.
+
+    python bench.py                                  # default matrix -> bench_output.json
+    python bench.py --resolutions 720p --durations 30 --cases flip,blur,all
+    python bench.py --out before.json  (then diff two runs across commits)
+    python bench.py --startup --cases copy  # also time a cold `import app`
+
+Clips come from ffmpeg's testsrc/sine sources; Groq, Gemini and edge-tts are
+replaced with local fakes so runs are offline and repeatable. Every case runs
+in a fresh interpreter so peak RSS (this process + ffmpeg children) is per case.
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import resource
+import platform
+import subprocess
+import tempfile
+import math
+import asyncio
+
+RESOLUTIONS = {'360p': (640, 360), '720p': (1280, 720), '1080p': (1920, 1080)}
+
+# Option combinations passed to process_video_edit (paths are filled in per run)
+CASES = {
+    'copy':        {},
+    'flip':        {'bypass_flip': True},
+    'zoom':        {'bypass_zoom': True},
+    'speed':       {'bypass_speed': True},
+    'color':       {'bypass_color': True},
+    'blur':        {'blur_enabled': True, 'blur_x': 20, 'blur_y': 20, 'blur_w': 120, 'blur_h': 60},
+    'logo':        {'logo': True, 'logo_x': 10, 'logo_y': 10, 'logo_w': 80, 'logo_h': 80},
+    'text':        {'text_watermark': 'Benchmark Recap', 'text_x': 20, 'text_y': 20},
+    'ai_audio':    {'ai_audio': True},
+    # Segmented TTS (create_ai_audio with the fake voice) cold and warm, then a render with the result
+    'tts':         {'tts': True},
+    'monezlation': {'monezlation': True},
+    # The pre-stream_loop graph (loop/aloop filters buffering every decoded frame), for RSS comparison
+    'monezlation_legacy': {'monezlation': True, 'legacy': True},
+    'all':         {'bypass_flip': True, 'bypass_zoom': True, 'bypass_speed': True, 'bypass_color': True,
+                    'blur_enabled': True, 'blur_x': 20, 'blur_y': 20, 'blur_w': 120, 'blur_h': 60,
+                    'logo': True, 'logo_x': 10, 'logo_y': 10, 'logo_w': 80, 'logo_h': 80,
+                    'text_watermark': 'Benchmark Recap', 'text_x': 20, 'text_y': 20, 'ai_audio': True},
+    'split':       {'bypass_flip': True, 'bypass_color': True, 'split_render': True},
+    'analysis':    {'analysis': True},
+}
+
+def sh(*args):
+    subprocess.run(args, check=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+# --- SYNTHETIC MEDIA ---
+def make_clip(work, res, seconds):
+    w, h = RESOLUTIONS[res]
+    path = os.path.join(work, f"src_{res}_{seconds}s.mp4")
+    if not os.path.exists(path):
+        sh('ffmpeg', '-y', '-f', 'lavfi', '-i', f'testsrc=size={w}x{h}:rate=30', '-f', 'lavfi', '-i', 'sine=frequency=440',
+           '-t', str(seconds), '-c:v', 'libx264', '-preset', 'ultrafast', '-pix_fmt', 'yuv420p', '-c:a', 'aac', path)
+    return path
+
+def make_tone(path, seconds, freq=220):
+    # -f mp3: the TTS cache writes to `<key>.<rand>.tmp`, which ffmpeg can't infer a muxer from
+    sh('ffmpeg', '-y', '-f', 'lavfi', '-i', f'sine=frequency={freq}', '-t', f'{seconds:.2f}', '-c:a', 'libmp3lame', '-b:a', '48k',
+       '-f', 'mp3', path)
+
+def make_script(seconds):
+    """Roughly `seconds` of speech at the fake voice's ~15 chars per second, in sentence-sized pieces."""
+    sentences, n = [], 0
+    while sum(len(x) + 1 for x in sentences) < seconds * 15:
+        n += 1
+        sentences.append(f"Synthetic recap sentence number {n} for the benchmark.")
+    return ' '.join(sentences)
+
+def make_logo(work):
+    path = os.path.join(work, 'logo.png')
+    if not os.path.exists(path):
+        sh('ffmpeg', '-y', '-f', 'lavfi', '-i', 'color=c=red:s=100x100', '-frames:v', '1', path)
+    return path
+
+# --- OFFLINE FAKES FOR THE AI SERVICES ---
+def install_fakes(utils):
+    def fake_segments(audio_path):
+        return [{'start': 0.0, 'end': 1.0, 'text': 'This is a synthetic transcript.'}]
+
+    async def fake_voice(text, output_file, voice):
+        # ~15 chars per second of speech, like edge-tts; off the loop so TTS_CONCURRENCY applies
+        await asyncio.to_thread(make_tone, output_file, max(0.5, len(text) / 15.0))
+
+    utils.transcribe_audio_segments = fake_segments
+    utils.get_gemini_manager().translate_text = lambda text: "ဒါက စမ်းသပ် ဘာသာပြန်ချက် ဖြစ်ပါတယ်။"
+    utils.generate_voice = fake_voice
+
+def run_legacy_monezlation(utils, src, out):
+    import ffmpeg
+    plays = math.ceil(70.0 / utils.probe_media(src)['duration'])
+    inp = ffmpeg.input(src)
+    v = inp.video.filter('loop', loop=plays - 1, size=32767)
+    a = inp.audio.filter('aloop', loop=plays - 1, size=2147483647)
+    utils.run_ffmpeg(ffmpeg.output(v, a, out, vcodec='libx264', acodec='aac', shortest=None,
+                                   **utils.ENCODER_PROFILES[utils.DEFAULT_ENCODER_PROFILE]))
+
+# --- ONE CASE (runs in a child interpreter) ---
+def run_case(spec):
+    # Private cache per case so the first analysis is a genuine miss
+    os.environ['CACHE_FOLDER'] = tempfile.mkdtemp(prefix='cache_', dir=spec['work'])
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    import utils
+    install_fakes(utils)
+
+    src, case = spec['src'], CASES[spec['case']]
+    out = os.path.join(spec['work'], f"out_{spec['case']}_{os.getpid()}.mp4")
+    result = {'case': spec['case'], 'resolution': spec['resolution'], 'duration': spec['duration']}
+
+    if case.get('analysis'):
+        started = time.perf_counter()
+        utils.analyze_script_with_ai(src)
+        result['cold_seconds'] = round(time.perf_counter() - started, 3)
+        started = time.perf_counter()
+        utils.analyze_script_with_ai(src)
+        result['warm_seconds'] = round(time.perf_counter() - started, 3)
+        result['wall_seconds'] = result['cold_seconds']
+    else:
+        opts = {k: v for k, v in case.items() if k not in ('logo', 'ai_audio', 'legacy', 'tts')}
+        if case.get('logo'): opts['logo_path'] = make_logo(spec['work'])
+        if case.get('tts'):
+            # Longer than the clip, like ai_audio; the second call is served from the segment cache
+            script, ap = make_script(spec['duration'] * 1.2), os.path.join(spec['work'], f"tts_{os.getpid()}.mp3")
+            for label in ('cold', 'warm'):
+                started = time.perf_counter()
+                if not utils.create_ai_audio(script, ap): result['tts_error'] = label
+                result[f'{label}_seconds'] = round(time.perf_counter() - started, 3)
+            opts['ai_audio_path'] = ap
+        if case.get('ai_audio'):
+            # Longer than the clip so the atempo sync path is exercised
+            opts['ai_audio_path'] = os.path.join(spec['work'], f"ai_{spec['duration']}s.mp3")
+            if not os.path.exists(opts['ai_audio_path']): make_tone(opts['ai_audio_path'], spec['duration'] * 1.2)
+        started = time.perf_counter()
+        if case.get('legacy'):
+            try:
+                run_legacy_monezlation(utils, src, out)
+                ok, msg = True, "Success"
+            except Exception as e: ok, msg = False, str(e)
+        else:
+            ok, msg = utils.process_video_edit(src, out, opts, threads=spec.get('threads'))
+        result['wall_seconds'] = round(time.perf_counter() - started, 3)
+        result['ok'] = ok
+        if not ok: result['error'] = msg
+        if os.path.exists(out):
+            result['output_bytes'] = os.path.getsize(out)
+            # Seconds actually rendered: monezlation writes ~70s from a 10s clip, bypass_speed less than the source
+            try: result['output_seconds'] = round(utils.probe_media(out)['duration'], 3)
+            except Exception: pass
+            os.remove(out)
+        if case.get('tts') and os.path.exists(opts['ai_audio_path']): os.remove(opts['ai_audio_path'])
+
+    rendered = result.get('output_seconds', spec['duration'])
+    result['realtime_factor'] = round(rendered / result['wall_seconds'], 2) if result['wall_seconds'] else None
+    # ru_maxrss is KB on Linux; ffmpeg runs as a child, Python itself is "self"
+    kb = 1 if sys.platform != 'darwin' else 1 / 1024
+    result['peak_rss_mb'] = {
+        'python': round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * kb / 1024, 1),
+        'ffmpeg': round(resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss * kb / 1024, 1),
+    }
+    print(json.dumps(result))
+
+# --- COLD START ---
+STARTUP_PROBE = r'''
+import sys, time, json
+started = time.perf_counter()
+import utils
+utils_seconds = time.perf_counter() - started
+import app
+print(json.dumps({'import_utils_seconds': round(utils_seconds, 3),
+                  'import_app_seconds': round(time.perf_counter() - started, 3),
+                  'sdks_loaded': [m for m in ('google.genai', 'groq', 'edge_tts', 'yt_dlp') if m in sys.modules]}))
+'''
+
+def measure_startup(work, runs=3):
+    """Best of `runs` cold imports of utils and app (prewarm off, scratch DB/cache), each in a fresh interpreter."""
+    env = dict(os.environ, PREWARM='0', JOB_DB_PATH=os.path.join(work, 'startup.db'), CACHE_FOLDER=os.path.join(work, 'startup_cache'))
+    samples = []
+    for _ in range(runs):
+        proc = subprocess.run([sys.executable, '-c', STARTUP_PROBE], capture_output=True, text=True, env=env,
+                              cwd=os.path.dirname(os.path.abspath(__file__)))
+        line = next((l for l in reversed(proc.stdout.splitlines()) if l.startswith('{')), None)
+        if not line: return {'ok': False, 'error': proc.stderr[-500:]}
+        samples.append(json.loads(line))
+    best = min(samples, key=lambda r: r['import_app_seconds'])
+    return dict(best, ok=True, runs=runs)
+
+# --- DRIVER ---
+def git_commit():
+    try: return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], text=True, stderr=subprocess.DEVNULL).strip()
+    except Exception: return None
+
+def ffmpeg_version():
+    try: return subprocess.check_output(['ffmpeg', '-version'], text=True).splitlines()[0]
+    except Exception: return None
+
+def main():
+    p = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    p.add_argument('--resolutions', default='360p,720p,1080p')
+    p.add_argument('--durations', default='10,60', help='clip lengths in seconds')
+    p.add_argument('--cases', default=','.join(CASES))
+    p.add_argument('--threads', type=int, default=None, help='per-render ffmpeg thread cap')
+    p.add_argument('--work', default=None, help='scratch dir (default: a temp dir)')
+    p.add_argument('--out', default='bench_output.json')
+    p.add_argument('--startup', action='store_true', help='also measure cold import time of utils/app')
+    p.add_argument('--run-case', help=argparse.SUPPRESS)
+    args = p.parse_args()
+
+    if args.run_case:
+        return run_case(json.loads(args.run_case))
+
+    work = args.work or tempfile.mkdtemp(prefix='recap_bench_')
+    os.makedirs(work, exist_ok=True)
+    results = []
+    startup = None
+    if args.startup:
+        startup = measure_startup(work)
+        print(f"🚀 startup: {startup}", file=sys.stderr)
+    for res in args.resolutions.split(','):
+        for dur in [int(d) for d in args.durations.split(',')]:
+            src = make_clip(work, res, dur)
+            for case in args.cases.split(','):
+                spec = {'case': case, 'resolution': res, 'duration': dur, 'src': src, 'work': work, 'threads': args.threads}
+                proc = subprocess.run([sys.executable, os.path.abspath(__file__), '--run-case', json.dumps(spec)],
+                                      capture_output=True, text=True)
+                line = next((l for l in reversed(proc.stdout.splitlines()) if l.startswith('{')), None)
+                r = json.loads(line) if line else {'case': case, 'resolution': res, 'duration': dur, 'ok': False, 'error': proc.stderr[-500:]}
+                results.append(r)
+                print(f"{res:>6} {dur:>4}s {case:<12} wall={r.get('wall_seconds')}s rtf={r.get('realtime_factor')} "
+                      f"rss={r.get('peak_rss_mb')} out={r.get('output_bytes')}", file=sys.stderr)
+
+    report = {
+        'commit': git_commit(),
+        'ffmpeg': ffmpeg_version(),
+        'python': platform.python_version(),
+        'cpu_count': os.cpu_count(),
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'startup': startup,
+        'results': results,
+    }
+    with open(args.out, 'w') as f: json.dump(report, f, indent=2)
+    print(f"📊 Wrote {len(results)} results to {args.out}", file=sys.stderr)
+
+if __name__ == '__main__':
+    main()
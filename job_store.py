@@ -0,0 +1,338 @@
+import os
+import json
+import time
+import sqlite3
+import threading
+
+# --- DURABLE JOB STORE (SQLITE WAL) ---
+# One database file shared by every worker process in the container, so a
+# restart doesn't lose queued renders and several gunicorn workers can drain
+# the same queue. A job is claimed with a lease; if the owning process dies the
+# lease expires and the job goes back to 'queued'.
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id          TEXT PRIMARY KEY,
+    kind        TEXT NOT NULL DEFAULT 'render',
+    status      TEXT NOT NULL,
+    payload     TEXT NOT NULL DEFAULT '{}',
+    result      TEXT NOT NULL DEFAULT '{}',
+    created_at  REAL NOT NULL,
+    updated_at  REAL NOT NULL,
+    started_at  REAL,
+    finished_at REAL,
+    worker      TEXT,
+    lease_until REAL,
+    attempts    INTEGER NOT NULL DEFAULT 0,
+    progress    TEXT NOT NULL DEFAULT '{}',
+    priority    INTEGER NOT NULL DEFAULT 0,
+    dedup_key   TEXT,
+    batch_id    TEXT,
+    user_id     TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_jobs_queue ON jobs (status, kind, created_at);
+CREATE TABLE IF NOT EXISTS uploads (
+    id          TEXT PRIMARY KEY,
+    filename    TEXT NOT NULL,
+    size        INTEGER NOT NULL,
+    received    INTEGER NOT NULL DEFAULT 0,
+    sha256      TEXT,
+    status      TEXT NOT NULL DEFAULT 'open',
+    created_at  REAL NOT NULL,
+    updated_at  REAL NOT NULL,
+    chunk_size  INTEGER,
+    writer      TEXT,
+    writer_until REAL
+);
+CREATE TABLE IF NOT EXISTS job_events (
+    job_id  TEXT NOT NULL,
+    status  TEXT NOT NULL,
+    at      REAL NOT NULL,
+    worker  TEXT
+);
+"""
+
+MIGRATIONS = [
+    ('progress', "progress TEXT NOT NULL DEFAULT '{}'"),
+    ('priority', "priority INTEGER NOT NULL DEFAULT 0"),
+    ('dedup_key', "dedup_key TEXT"),
+    ('batch_id', "batch_id TEXT"),
+    ('user_id', "user_id TEXT"),
+]
+UPLOAD_MIGRATIONS = [
+    ('chunk_size', "chunk_size INTEGER"),
+    ('writer', "writer TEXT"),
+    ('writer_until', "writer_until REAL"),
+]
+
+class JobStore:
+    def __init__(self, db_path, lease_seconds=60, max_attempts=3, express_priority=None):
+        """express_priority: jobs at or above it (short interactive previews) are claimed before fair share applies."""
+        self.db_path = db_path
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self.express_priority = express_priority if express_priority is not None else float('inf')
+        self._local = threading.local()
+        os.makedirs(os.path.dirname(db_path) or '.', exist_ok=True)
+        conn = self._conn()
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.executescript(SCHEMA)
+        self._migrate(conn)
+
+    def _migrate(self, conn):
+        # Columns added after the first release; CREATE TABLE IF NOT EXISTS won't add them
+        have = {r['name'] for r in conn.execute("PRAGMA table_info(jobs)")}
+        for name, ddl in MIGRATIONS:
+            if name not in have: conn.execute(f"ALTER TABLE jobs ADD COLUMN {ddl}")
+        have = {r['name'] for r in conn.execute("PRAGMA table_info(uploads)")}
+        for name, ddl in UPLOAD_MIGRATIONS:
+            if name not in have: conn.execute(f"ALTER TABLE uploads ADD COLUMN {ddl}")
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_jobs_dedup ON jobs (dedup_key)")
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_jobs_batch ON jobs (batch_id)")
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_jobs_user ON jobs (status, user_id)")
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_jobs_finished ON jobs (kind, status, finished_at)")
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_job_events_job ON job_events (job_id)")
+
+    def _conn(self):
+        # sqlite3 connections are not shareable across threads; keep one per thread
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("PRAGMA busy_timeout=30000")
+            self._local.conn = conn
+        return conn
+
+    def _event(self, conn, job_id, status, worker=None):
+        conn.execute("INSERT INTO job_events (job_id, status, at, worker) VALUES (?, ?, ?, ?)",
+                     (job_id, status, time.time(), worker))
+
+    # --- WRITERS ---
+    def create(self, job_id, payload, kind='render', priority=0, dedup_key=None, batch_id=None, user_id=None,
+               status='queued', result=None):
+        """Inserts a job; status/result let a batch record a stage that failed before it could be queued."""
+        now = time.time()
+        conn = self._conn()
+        finished = now if status in ('success', 'failed') else None
+        with conn:
+            conn.execute("BEGIN IMMEDIATE")
+            conn.execute(
+                "INSERT INTO jobs (id, kind, status, payload, result, created_at, updated_at, finished_at, priority, "
+                "dedup_key, batch_id, user_id) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (job_id, kind, status, json.dumps(payload), json.dumps(result or {}), now, now, finished, priority,
+                 dedup_key, batch_id, user_id))
+            self._event(conn, job_id, status)
+
+    def claim(self, worker_id, kinds=('render',)):
+        """Atomically takes the next queued job. Returns (job_id, payload) or None.
+
+        Order: express jobs (priority >= express_priority, i.e. previews)
+        first, then the user with the fewest jobs already running in this
+        pool (fair share, so one big batch can't hold every slot), then
+        highest priority, then oldest. Below the express level priority only
+        reorders jobs whose owners hold equal shares.
+        """
+        now = time.time()
+        conn = self._conn()
+        marks = ','.join('?' * len(kinds))
+        with conn:
+            conn.execute("BEGIN IMMEDIATE")
+            row = conn.execute(
+                f"SELECT id, payload FROM jobs q WHERE status = 'queued' AND kind IN ({marks}) "
+                f"ORDER BY priority >= ? DESC, (SELECT COUNT(*) FROM jobs r WHERE r.status = 'processing' AND r.user_id = q.user_id "
+                f"AND r.kind IN ({marks})), priority DESC, created_at, rowid LIMIT 1",
+                (*kinds, self.express_priority, *kinds)).fetchone()
+            if not row: return None
+            conn.execute(
+                "UPDATE jobs SET status = 'processing', worker = ?, started_at = ?, updated_at = ?, "
+                "lease_until = ?, attempts = attempts + 1 WHERE id = ?",
+                (worker_id, now, now, now + self.lease_seconds, row['id']))
+            self._event(conn, row['id'], 'processing', worker_id)
+        return row['id'], json.loads(row['payload'])
+
+    def heartbeat(self, job_ids, worker_prefix):
+        """Extends the lease of jobs this process is still working on."""
+        if not job_ids: return
+        now = time.time()
+        conn = self._conn()
+        marks = ','.join('?' * len(job_ids))
+        conn.execute(
+            f"UPDATE jobs SET lease_until = ? WHERE status = 'processing' AND worker LIKE ? AND id IN ({marks})",
+            (now + self.lease_seconds, worker_prefix + '%', *job_ids))
+
+    def update_progress(self, job_id, progress):
+        """Stage/percent info shown by /status while a job runs; cleared when it finishes."""
+        self._conn().execute("UPDATE jobs SET progress = ?, updated_at = ? WHERE id = ? AND status = 'processing'",
+                             (json.dumps(progress), time.time(), job_id))
+
+    def finish(self, job_id, status, result=None):
+        now = time.time()
+        conn = self._conn()
+        with conn:
+            conn.execute("BEGIN IMMEDIATE")
+            conn.execute(
+                "UPDATE jobs SET status = ?, result = ?, progress = '{}', finished_at = ?, updated_at = ?, lease_until = NULL WHERE id = ?",
+                (status, json.dumps(result or {}), now, now, job_id))
+            self._event(conn, job_id, status)
+
+    def requeue_interrupted(self):
+        """Puts jobs whose worker stopped heartbeating back in the queue (or fails them after max_attempts)."""
+        now = time.time()
+        conn = self._conn()
+        with conn:
+            conn.execute("BEGIN IMMEDIATE")
+            rows = conn.execute(
+                "SELECT id, attempts FROM jobs WHERE status = 'processing' AND lease_until < ?", (now,)).fetchall()
+            requeued = 0
+            for row in rows:
+                if row['attempts'] >= self.max_attempts:
+                    conn.execute(
+                        "UPDATE jobs SET status = 'failed', result = ?, finished_at = ?, updated_at = ?, lease_until = NULL WHERE id = ?",
+                        (json.dumps({'message': 'Job interrupted too many times'}), now, now, row['id']))
+                    self._event(conn, row['id'], 'failed')
+                else:
+                    conn.execute(
+                        "UPDATE jobs SET status = 'queued', worker = NULL, lease_until = NULL, updated_at = ? WHERE id = ?",
+                        (now, row['id']))
+                    self._event(conn, row['id'], 'queued')
+                    requeued += 1
+        return requeued
+
+    def prune(self, max_age, upload_idle=None):
+        """Deletes finished jobs (and their events) and finished uploads older than max_age seconds, plus
+        open uploads idle for upload_idle (their .part has expired). Returns jobs + uploads removed."""
+        now = time.time()
+        cutoff = now - max_age
+        conn = self._conn()
+        with conn:
+            conn.execute("BEGIN IMMEDIATE")
+            old = "SELECT id FROM jobs WHERE status IN ('success', 'failed') AND finished_at < ?"
+            conn.execute(f"DELETE FROM job_events WHERE job_id IN ({old})", (cutoff,))
+            removed = conn.execute(f"DELETE FROM jobs WHERE id IN ({old})", (cutoff,)).rowcount
+            removed += conn.execute(
+                "DELETE FROM uploads WHERE (status IN ('complete', 'failed', 'expired') AND updated_at < ?) "
+                "OR (status IN ('open', 'verifying') AND updated_at < ?)",
+                (cutoff, now - (upload_idle or max_age))).rowcount
+        return removed
+
+    # --- READERS ---
+    def ping(self):
+        return self._conn().execute("SELECT 1").fetchone()[0] == 1
+
+    def get(self, job_id):
+        """Job as the /status route reports it: status merged with the result fields."""
+        row = self._conn().execute("SELECT status, result, progress FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        if not row: return None
+        job = json.loads(row['result'] or '{}')
+        if row['status'] == 'processing': job.update(json.loads(row['progress'] or '{}'))
+        job['status'] = row['status']
+        return job
+
+    def queue_position(self, job_id, pools=None):
+        """(kind, queued jobs ahead of this one) or (None, None) if it isn't queued.
+
+        pools maps a kind to every kind drained by the same worker pool, so a
+        download waits behind queued analyses too. The position is a snapshot
+        of claim()'s ordering; fair share can move it as other users' jobs start.
+        """
+        conn = self._conn()
+        row = conn.execute("SELECT kind FROM jobs WHERE id = ? AND status = 'queued'", (job_id,)).fetchone()
+        if not row: return None, None
+        kinds = tuple((pools or {}).get(row['kind'], (row['kind'],)))
+        marks = ','.join('?' * len(kinds))
+        active = {r[0]: r[1] for r in conn.execute(
+            f"SELECT user_id, COUNT(*) FROM jobs WHERE status = 'processing' AND kind IN ({marks}) AND user_id IS NOT NULL "
+            "GROUP BY user_id", kinds)}
+        queued = conn.execute(
+            f"SELECT id, priority, user_id, created_at, rowid FROM jobs WHERE status = 'queued' AND kind IN ({marks})", kinds).fetchall()
+        queued.sort(key=lambda r: (r['priority'] < self.express_priority, active.get(r['user_id'], 0), -r['priority'],
+                                   r['created_at'], r['rowid']))
+        return row['kind'], next(i for i, r in enumerate(queued) if r['id'] == job_id)
+
+    def find_by_dedup_key(self, dedup_key):
+        """Most recent live or successful job with this key: (job_id, status, payload) or None."""
+        row = self._conn().execute(
+            "SELECT id, status, payload FROM jobs WHERE dedup_key = ? AND status IN ('queued', 'processing', 'success') "
+            "ORDER BY created_at DESC LIMIT 1", (dedup_key,)).fetchone()
+        if not row: return None
+        return row['id'], row['status'], json.loads(row['payload'])
+
+    def live_counts(self):
+        """{(kind, status): n} for queued and processing jobs."""
+        rows = self._conn().execute(
+            "SELECT kind, status, COUNT(*) AS n FROM jobs WHERE status IN ('queued', 'processing') GROUP BY kind, status")
+        return {(r['kind'], r['status']): r['n'] for r in rows}
+
+    def batch_jobs(self, batch_id):
+        """Every job (all stages) of a batch, oldest first."""
+        rows = self._conn().execute(
+            "SELECT id, kind, status, payload, result, progress FROM jobs WHERE batch_id = ? ORDER BY created_at, rowid",
+            (batch_id,)).fetchall()
+        return [{'id': r['id'], 'kind': r['kind'], 'status': r['status'], 'payload': json.loads(r['payload']),
+                 'result': json.loads(r['result'] or '{}'), 'progress': json.loads(r['progress'] or '{}')} for r in rows]
+
+    def running_started(self, kinds=('render',)):
+        marks = ','.join('?' * len(kinds))
+        rows = self._conn().execute(
+            f"SELECT started_at FROM jobs WHERE status = 'processing' AND kind IN ({marks})", tuple(kinds)).fetchall()
+        return [r['started_at'] for r in rows]
+
+    def average_duration(self, kinds=('render',), sample=20):
+        # One query per kind so each is a walk down idx_jobs_finished instead of a sort (runs on every /status tick)
+        conn = self._conn()
+        rows = [r for kind in kinds for r in conn.execute(
+            "SELECT finished_at, finished_at - started_at FROM jobs WHERE kind = ? AND status = 'success' "
+            "AND started_at IS NOT NULL ORDER BY finished_at DESC LIMIT ?", (kind, sample))]
+        recent = sorted(rows, reverse=True)[:sample]
+        return sum(r[1] for r in recent) / len(recent) if recent else None
+
+    # --- RESUMABLE UPLOADS ---
+    def create_upload(self, upload_id, filename, size, sha256=None, chunk_size=None):
+        now = time.time()
+        self._conn().execute(
+            "INSERT INTO uploads (id, filename, size, sha256, chunk_size, created_at, updated_at) VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (upload_id, filename, size, sha256, chunk_size, now, now))
+
+    def get_upload(self, upload_id):
+        row = self._conn().execute("SELECT * FROM uploads WHERE id = ?", (upload_id,)).fetchone()
+        return dict(row) if row else None
+
+    def claim_upload_write(self, upload_id, offset, token, lease):
+        """Takes the single write slot of an upload at `offset`. False if the offset moved or another
+        request holds an unexpired claim (a stalled PUT whose retry arrived first)."""
+        now = time.time()
+        cur = self._conn().execute(
+            "UPDATE uploads SET writer = ?, writer_until = ? WHERE id = ? AND received = ? AND status = 'open' "
+            "AND (writer IS NULL OR writer_until < ?)", (token, now + lease, upload_id, offset, now))
+        return cur.rowcount == 1
+
+    def renew_upload_write(self, upload_id, token, lease):
+        """Extends the claim while bytes keep arriving. False once another request has taken over."""
+        cur = self._conn().execute(
+            "UPDATE uploads SET writer_until = ? WHERE id = ? AND writer = ?", (time.time() + lease, upload_id, token))
+        return cur.rowcount == 1
+
+    def release_upload_write(self, upload_id, token):
+        self._conn().execute("UPDATE uploads SET writer = NULL, writer_until = NULL WHERE id = ? AND writer = ?",
+                             (upload_id, token))
+
+    def advance_upload(self, upload_id, expected_offset, new_offset, token):
+        """Commits a chunk and frees the write slot, only while `token` still holds it. Returns True on success."""
+        cur = self._conn().execute(
+            "UPDATE uploads SET received = ?, updated_at = ?, writer = NULL, writer_until = NULL "
+            "WHERE id = ? AND received = ? AND status = 'open' AND writer = ?",
+            (new_offset, time.time(), upload_id, expected_offset, token))
+        return cur.rowcount == 1
+
+    def begin_upload_verify(self, upload_id, stale_after):
+        """Moves a fully received upload from 'open' to 'verifying'; True only for the one caller that did.
+        A 'verifying' row untouched for stale_after seconds (its verifier died) can be taken over."""
+        now = time.time()
+        cur = self._conn().execute(
+            "UPDATE uploads SET status = 'verifying', updated_at = ? WHERE id = ? AND received = size "
+            "AND (status = 'open' OR (status = 'verifying' AND updated_at < ?))", (now, upload_id, now - stale_after))
+        return cur.rowcount == 1
+
+    def set_upload_status(self, upload_id, status):
+        self._conn().execute("UPDATE uploads SET status = ?, updated_at = ? WHERE id = ?", (status, time.time(), upload_id))
@@ -0,0 +1,161 @@
+import time
+import sqlite3
+import threading
+from contextlib import contextmanager
+
+# --- PROMETHEUS-STYLE METRICS ---
+# Counters and histograms are accumulated in memory and flushed as deltas
+# into a `metrics` table in the job database, so /metrics reports the same
+# totals whichever gunicorn process answers the scrape (and they survive
+# restarts). Before bind() is called (bench, scripts) nothing touches disk.
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS metrics (
+    sample  TEXT NOT NULL,
+    labels  TEXT NOT NULL,
+    value   REAL NOT NULL,
+    PRIMARY KEY (sample, labels)
+);
+"""
+
+SECONDS_BUCKETS = (0.1, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600, 1800, 3600)
+RATIO_BUCKETS = (0.25, 0.5, 1, 2, 4, 8, 16, 32)
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+def format_labels(labels):
+    """{'b': 1, 'a': 2} -> 'a="2",b="1"' (sorted, `le` last, as Prometheus prints it)."""
+    items = sorted((k, v) for k, v in labels.items() if k != 'le')
+    if 'le' in labels: items.append(('le', labels['le']))
+    return ','.join(f'{k}="{_escape(v)}"' for k, v in items)
+
+def _format_le(bound):
+    return '+Inf' if bound == float('inf') else f"{bound:g}"
+
+class Metrics:
+    def __init__(self):
+        self.db_path = None
+        self._meta = {}       # name -> (type, help, buckets)
+        self._pending = {}    # (sample, labels) -> delta not yet flushed
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    def bind(self, db_path):
+        """Persists samples in db_path (the job store's SQLite file) from now on."""
+        self.db_path = db_path
+        self._conn().executescript(SCHEMA)
+
+    def _conn(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA busy_timeout=30000")
+            self._local.conn = conn
+        return conn
+
+    # --- DECLARATIONS ---
+    def counter(self, name, help):
+        self._meta[name] = ('counter', help, None)
+
+    def histogram(self, name, help, buckets=SECONDS_BUCKETS):
+        self._meta[name] = ('histogram', help, tuple(buckets) + (float('inf'),))
+
+    # --- RECORDING ---
+    def _add(self, sample, labels, delta):
+        key = (sample, format_labels(labels))
+        self._pending[key] = self._pending.get(key, 0.0) + delta
+
+    def inc(self, name, value=1, **labels):
+        with self._lock: self._add(name, labels, value)
+
+    def observe(self, name, value, **labels):
+        buckets = self._meta[name][2]
+        with self._lock:
+            # Zero deltas too, so every bucket of a series exists from its first observation
+            for bound in buckets:
+                self._add(f"{name}_bucket", {**labels, 'le': _format_le(bound)}, 1 if value <= bound else 0)
+            self._add(f"{name}_sum", labels, value)
+            self._add(f"{name}_count", labels, 1)
+
+    @contextmanager
+    def span(self, stage, **labels):
+        """Times a pipeline stage into recap_stage_seconds{stage, status, ...} and logs one line."""
+        started = time.perf_counter()
+        status = 'ok'
+        try:
+            yield
+        except BaseException:
+            status = 'error'
+            raise
+        finally:
+            elapsed = time.perf_counter() - started
+            self.observe('recap_stage_seconds', elapsed, stage=stage, status=status, **labels)
+            extra = ''.join(f" {k}={v}" for k, v in labels.items())
+            print(f"⏱️ Span stage={stage} status={status} seconds={elapsed:.3f}{extra}")
+
+    # --- STORAGE ---
+    def flush(self):
+        """Adds pending deltas to the shared table (no-op until bind())."""
+        if not self.db_path: return
+        with self._lock: pending, self._pending = self._pending, {}
+        if not pending: return
+        conn = self._conn()
+        try:
+            with conn:
+                conn.execute("BEGIN IMMEDIATE")
+                conn.executemany(
+                    "INSERT INTO metrics (sample, labels, value) VALUES (?, ?, ?) "
+                    "ON CONFLICT(sample, labels) DO UPDATE SET value = value + excluded.value",
+                    [(s, l, v) for (s, l), v in pending.items()])
+        except Exception:
+            # Keep the deltas for the next flush rather than losing them
+            with self._lock:
+                for key, v in pending.items(): self._pending[key] = self._pending.get(key, 0.0) + v
+            raise
+
+    def samples(self):
+        """{(sample, labels): value} — flushed totals, or this process's own before bind()."""
+        self.flush()
+        if self.db_path:
+            return {(r[0], r[1]): r[2] for r in self._conn().execute("SELECT sample, labels, value FROM metrics")}
+        with self._lock: return dict(self._pending)
+
+    # --- EXPOSITION ---
+    def render(self, gauges=()):
+        """Prometheus text format. gauges: [(name, help, [(labels, value), ...])] computed at scrape time."""
+        by_metric = {}
+        for (sample, labels), value in self.samples().items():
+            name = next((n for n in (sample, sample.rsplit('_', 1)[0]) if n in self._meta), sample)
+            by_metric.setdefault(name, []).append((sample, labels, value))
+
+        lines = []
+        for name in sorted(by_metric):
+            kind, help, _ = self._meta.get(name, ('untyped', '', None))
+            lines += [f"# HELP {name} {help}", f"# TYPE {name} {kind}"]
+            for sample, labels, value in sorted(by_metric[name], key=self._sort_key):
+                lines.append(f"{sample}{{{labels}}} {value:g}" if labels else f"{sample} {value:g}")
+        for name, help, series in gauges:
+            lines += [f"# HELP {name} {help}", f"# TYPE {name} gauge"]
+            for labels, value in series:
+                labels = format_labels(labels)
+                lines.append(f"{name}{{{labels}}} {value:g}" if labels else f"{name} {value:g}")
+        return '\n'.join(lines) + '\n'
+
+    @staticmethod
+    def _sort_key(row):
+        # Buckets in ascending `le` order, then _sum/_count, grouped per label set
+        sample, labels, _ = row
+        base, _, le = labels.partition('le="')
+        base, le = base.rstrip(','), le.rstrip('"')
+        bound = float('inf') if le == '+Inf' else float(le) if le else 0.0
+        return base, sample.endswith('_bucket') is False, bound, sample
+
+metrics = Metrics()
+metrics.histogram('recap_stage_seconds', 'Wall time of one pipeline stage (download, probe, extract_audio, transcribe, translate, tts, render).')
+metrics.histogram('recap_job_seconds', 'Wall time of a job from claim to finish.')
+metrics.counter('recap_jobs_total', 'Jobs finished, by kind and status.')
+metrics.histogram('recap_render_realtime_factor', 'Seconds of output rendered per second of wall time.', RATIO_BUCKETS)
+metrics.histogram('recap_gemini_request_seconds', 'Latency of one Gemini generate_content call.')
+metrics.counter('recap_gemini_requests_total', 'Gemini generate_content calls, by model, key slot and outcome.')
+metrics.counter('recap_tts_segments_total', 'TTS segments needed, by source (cache or synthesized).')
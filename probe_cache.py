@@ -0,0 +1,133 @@
+import os
+import json
+import time
+import hashlib
+import threading
+import subprocess
+from collections import OrderedDict
+import ffmpeg
+
+# --- PROBE / METADATA CACHE ---
+# One ffprobe per file version: entries are keyed by (path, size, mtime), kept
+# in a small in-memory LRU and as JSON sidecars so every gunicorn process
+# shares them. The keyframe index (a full packet scan) is filled separately,
+# in the background after an upload, and only split renders wait for it.
+
+def keyframe_times(path, start_time=0.0):
+    """Keyframe timestamps (seconds from the start of the file) of the first video stream, from packet flags."""
+    out = subprocess.run(
+        ['ffprobe', '-v', 'error', '-select_streams', 'v:0', '-show_entries', 'packet=pts_time,flags', '-of', 'csv=p=0', path],
+        capture_output=True, text=True, check=True).stdout
+    times = []
+    for line in out.splitlines():
+        pts, _, flags = line.partition(',')
+        if 'K' in flags:
+            try: times.append(round(float(pts) - start_time, 6))
+            except ValueError: pass
+    return sorted(times)
+
+def _rate(value):
+    num, _, den = (value or '0/1').partition('/')
+    try: return round(float(num) / float(den or 1), 3)
+    except (ValueError, ZeroDivisionError): return None
+
+def summarize_probe(probe):
+    """The fields the pipeline uses from `ffmpeg.probe` output."""
+    fmt = probe.get('format', {})
+    video = next((s for s in probe.get('streams', []) if s.get('codec_type') == 'video'), None)
+    audio = next((s for s in probe.get('streams', []) if s.get('codec_type') == 'audio'), None)
+    meta = {
+        'duration': float(fmt.get('duration') or 0),
+        'start_time': float(fmt.get('start_time') or 0),
+        'format': fmt.get('format_name'),
+        'has_video': video is not None,
+        'has_audio': audio is not None,
+        'audio_codec': audio.get('codec_name') if audio else None,
+        'keyframes': None,
+    }
+    if video:
+        meta.update(width=int(video['width']), height=int(video['height']),
+                    video_codec=video.get('codec_name'), fps=_rate(video.get('avg_frame_rate')))
+    return meta
+
+def media_info(meta):
+    """Client-facing subset (no keyframe list)."""
+    keys = ('duration', 'width', 'height', 'fps', 'video_codec', 'audio_codec', 'has_video', 'has_audio')
+    return {k: meta.get(k) for k in keys if k in meta}
+
+class ProbeCache:
+    def __init__(self, root, memory_entries=256):
+        self.root = root
+        self.memory_entries = memory_entries
+        self.counters = {'hit': 0, 'miss': 0, 'keyframe_scans': 0}
+        self._mem = OrderedDict()
+        self._lock = threading.Lock()
+        os.makedirs(root, exist_ok=True)
+
+    def _key(self, path):
+        st = os.stat(path)
+        return hashlib.sha256(f"{os.path.abspath(path)}|{st.st_size}|{st.st_mtime_ns}".encode()).hexdigest()[:32]
+
+    def _sidecar(self, key):
+        return os.path.join(self.root, key + '.json')
+
+    def _load(self, key):
+        with self._lock:
+            if key in self._mem:
+                self._mem.move_to_end(key)
+                return self._mem[key]
+        try:
+            with open(self._sidecar(key), encoding='utf-8') as f: meta = json.load(f)
+        except (OSError, ValueError):
+            return None
+        self._remember(key, meta)
+        return meta
+
+    def _remember(self, key, meta):
+        with self._lock:
+            self._mem[key] = meta
+            self._mem.move_to_end(key)
+            while len(self._mem) > self.memory_entries: self._mem.popitem(last=False)
+
+    def _store(self, key, meta):
+        self._remember(key, meta)
+        tmp = f"{self._sidecar(key)}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp, 'w', encoding='utf-8') as f: json.dump(meta, f)
+        os.replace(tmp, self._sidecar(key))
+
+    def get(self, path, keyframes=False):
+        """Metadata for path (see summarize_probe); keyframes=True also fills meta['keyframes']."""
+        key = self._key(path)
+        meta = self._load(key)
+        with self._lock: self.counters['hit' if meta else 'miss'] += 1
+        if meta is None:
+            meta = summarize_probe(ffmpeg.probe(path))
+            self._store(key, meta)
+        if keyframes and meta['keyframes'] is None and meta['has_video']:
+            with self._lock: self.counters['keyframe_scans'] += 1
+            meta = dict(meta, keyframes=keyframe_times(path, meta['start_time']))
+            self._store(key, meta)
+        return meta
+
+    def warm(self, path):
+        """Builds the keyframe index in a background thread so a later split render doesn't scan the file."""
+        def run():
+            try: self.get(path, keyframes=True)
+            except Exception as e: print(f"⚠️ Probe Warm Error: {e}")
+        threading.Thread(target=run, daemon=True).start()
+
+    def prune(self, max_age):
+        """Drops sidecars not written for max_age seconds (their files are long gone or changed)."""
+        cutoff = time.time() - max_age
+        removed = 0
+        for name in os.listdir(self.root):
+            p = os.path.join(self.root, name)
+            try:
+                if os.path.getmtime(p) < cutoff:
+                    os.remove(p)
+                    removed += 1
+            except OSError: pass
+        return removed
+
+    def stats(self):
+        with self._lock: return dict(self.counters, memory_entries=len(self._mem))
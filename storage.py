@@ -0,0 +1,188 @@
+import os
+import time
+import sqlite3
+import threading
+
+# --- DISK-QUOTA-AWARE STORAGE MANAGER ---
+# Every upload, AI audio track and render output is indexed with its size,
+# owner job and last access, in the same SQLite file as the job store. A
+# file is pinned while any queued/processing job references it. Unpinned files
+# expire by per-folder TTL and are evicted least recently used first when
+# the total goes over the byte budget, so a sweep never has to stat the folders.
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (
+    path        TEXT PRIMARY KEY,
+    folder      TEXT NOT NULL,
+    size        INTEGER NOT NULL,
+    owner_job   TEXT,
+    created_at  REAL NOT NULL,
+    last_access REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_files_lru ON files (last_access);
+CREATE TABLE IF NOT EXISTS file_refs (
+    job_id  TEXT NOT NULL,
+    path    TEXT NOT NULL,
+    PRIMARY KEY (job_id, path)
+);
+CREATE INDEX IF NOT EXISTS idx_file_refs_path ON file_refs (path);
+"""
+
+# A file is pinned if an unfinished job references it
+PINNED_SQL = """EXISTS (SELECT 1 FROM file_refs r JOIN jobs j ON j.id = r.job_id
+                       WHERE r.path = files.path AND j.status IN ('queued', 'processing'))"""
+
+class StorageManager:
+    def __init__(self, db_path, folders, budget_bytes):
+        """folders: {folder_path: ttl_seconds since last access}."""
+        self.db_path = db_path
+        self.folders = {os.path.abspath(f): ttl for f, ttl in folders.items()}
+        self.budget_bytes = budget_bytes
+        self.counters = {'evicted_files': 0, 'evicted_bytes': 0, 'expired_files': 0}
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._touched = {}  # path -> time of this process's last touch(), for min_interval
+        self._conn().executescript(SCHEMA)
+
+    def _conn(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA busy_timeout=30000")
+            self._local.conn = conn
+        return conn
+
+    def _folder_of(self, path):
+        path = os.path.abspath(path)
+        return next((f for f in self.folders if path.startswith(f + os.sep)), os.path.dirname(path))
+
+    # --- INDEX ---
+    def register(self, path, owner_job=None, size=None):
+        """Adds/refreshes a file in the index. size overrides the on-disk size (e.g. reserved upload)."""
+        path = os.path.abspath(path)
+        if size is None: size = os.path.getsize(path) if os.path.exists(path) else 0
+        now = time.time()
+        self._conn().execute(
+            "INSERT INTO files (path, folder, size, owner_job, created_at, last_access) VALUES (?, ?, ?, ?, ?, ?) "
+            "ON CONFLICT(path) DO UPDATE SET size = excluded.size, last_access = excluded.last_access, "
+            "owner_job = COALESCE(excluded.owner_job, files.owner_job)",
+            (path, self._folder_of(path), size, owner_job, now, now))
+        # Never evict the file being registered: its caller is about to use it
+        if self.total_bytes() > self.budget_bytes: self.evict(protect=(path,))
+
+    def rename(self, old, new):
+        old, new = os.path.abspath(old), os.path.abspath(new)
+        self._conn().execute("UPDATE files SET path = ?, folder = ?, last_access = ? WHERE path = ?",
+                             (new, self._folder_of(new), time.time(), old))
+        self._conn().execute("UPDATE file_refs SET path = ? WHERE path = ?", (new, old))
+
+    def forget(self, path):
+        self._conn().execute("DELETE FROM files WHERE path = ?", (os.path.abspath(path),))
+
+    def touch(self, path, min_interval=0):
+        """Marks an access. min_interval skips the write if this process touched path that recently
+        (a player issues many Range requests; TTLs are minutes, so a minute of slack is harmless)."""
+        path, now = os.path.abspath(path), time.time()
+        with self._lock:
+            if now - self._touched.get(path, 0) < min_interval: return
+            if len(self._touched) > 10000: self._touched.clear()
+            self._touched[path] = now
+        self._conn().execute("UPDATE files SET last_access = ? WHERE path = ?", (now, path))
+
+    def reference(self, job_id, paths):
+        """Pins paths for as long as job_id is queued or processing, and counts as an access for LRU."""
+        conn = self._conn()
+        now = time.time()
+        for p in paths:
+            if not p: continue
+            conn.execute("INSERT OR IGNORE INTO file_refs (job_id, path) VALUES (?, ?)", (job_id, os.path.abspath(p)))
+            conn.execute("UPDATE files SET last_access = ? WHERE path = ?", (now, os.path.abspath(p)))
+
+    def is_pinned(self, path):
+        row = self._conn().execute(f"SELECT {PINNED_SQL} FROM files WHERE path = ?", (os.path.abspath(path),)).fetchone()
+        return bool(row and row[0])
+
+    def reconcile(self):
+        """Indexes files nobody registered (yt-dlp leftovers, partial outputs of crashed jobs), grows rows whose
+        file got bigger or was written since, and forgets rows whose file is gone. Run at startup and every sweep."""
+        conn = self._conn()
+        known = {r['path']: (r['size'], r['last_access']) for r in conn.execute("SELECT path, size, last_access FROM files")}
+        seen = set()
+        for folder in self.folders:
+            if not os.path.isdir(folder): continue
+            for name in os.listdir(folder):
+                p = os.path.join(folder, name)
+                if name.startswith('.') or not os.path.isfile(p): continue
+                seen.add(p)
+                try: st = os.stat(p)
+                except FileNotFoundError: continue
+                if p not in known:
+                    conn.execute("INSERT OR IGNORE INTO files (path, folder, size, created_at, last_access) VALUES (?, ?, ?, ?, ?)",
+                                 (p, folder, st.st_size, st.st_mtime, st.st_mtime))
+                elif st.st_size > known[p][0] or st.st_mtime > known[p][1]:
+                    # Never shrinks a row: uploads reserve their full size up front
+                    conn.execute("UPDATE files SET size = MAX(size, ?), last_access = MAX(last_access, ?) WHERE path = ?",
+                                 (st.st_size, st.st_mtime, p))
+        for p in set(known) - seen:
+            if self._folder_of(p) in self.folders: conn.execute("DELETE FROM files WHERE path = ?", (p,))
+        # Only finished jobs: a ref written by enqueue_job just before its job row must survive a concurrent sweep
+        conn.execute("DELETE FROM file_refs WHERE job_id IN (SELECT id FROM jobs WHERE status IN ('success', 'failed'))")
+
+    # --- EVICTION ---
+    def _delete(self, path, size, counter):
+        try: os.remove(path)
+        except FileNotFoundError: pass
+        self._conn().execute("DELETE FROM files WHERE path = ?", (path,))
+        with self._lock:
+            self.counters[counter] += 1
+            if counter == 'evicted_files': self.counters['evicted_bytes'] += size
+
+    def evict(self, protect=()):
+        """TTL expiry per folder, then LRU eviction of unpinned files down to the budget. Returns files removed.
+        protect: paths to keep this pass even though unpinned (a file registered a moment ago)."""
+        conn = self._conn()
+        now = time.time()
+        removed = 0
+        protect = {os.path.abspath(p) for p in protect}
+        conn.execute("DELETE FROM file_refs WHERE job_id IN (SELECT id FROM jobs WHERE status IN ('success', 'failed'))")
+        for folder, ttl in self.folders.items():
+            rows = conn.execute(
+                f"SELECT path, size FROM files WHERE folder = ? AND last_access < ? AND NOT {PINNED_SQL}",
+                (folder, now - ttl)).fetchall()
+            for r in rows:
+                if r['path'] in protect: continue
+                self._delete(r['path'], r['size'], 'expired_files')
+                removed += 1
+
+        over = self.total_bytes() - self.budget_bytes
+        if over > 0:
+            for r in conn.execute(f"SELECT path, size FROM files WHERE NOT {PINNED_SQL} ORDER BY last_access").fetchall():
+                if over <= 0: break
+                if r['path'] in protect: continue
+                self._delete(r['path'], r['size'], 'evicted_files')
+                over -= r['size']
+                removed += 1
+            if over > 0: print(f"⚠️ Storage: {over} bytes over budget, all remaining files are pinned.")
+        return removed
+
+    # --- METRICS ---
+    def total_bytes(self):
+        return self._conn().execute("SELECT COALESCE(SUM(size), 0) FROM files").fetchone()[0]
+
+    def stats(self):
+        conn = self._conn()
+        by_folder = {os.path.basename(r['folder']): {'files': r['n'], 'bytes': r['b']} for r in conn.execute(
+            "SELECT folder, COUNT(*) AS n, COALESCE(SUM(size), 0) AS b FROM files GROUP BY folder")}
+        pinned = conn.execute(f"SELECT COUNT(*), COALESCE(SUM(size), 0) FROM files WHERE {PINNED_SQL}").fetchone()
+        total = self.total_bytes()
+        with self._lock: counters = dict(self.counters)
+        return {
+            'total_bytes': total,
+            'budget_bytes': self.budget_bytes,
+            'usage_ratio': round(total / self.budget_bytes, 4) if self.budget_bytes else None,
+            'pinned_files': pinned[0],
+            'pinned_bytes': pinned[1],
+            'folders': by_folder,
+            'counters': counters,
+        }
@@ -1,48 +1,173 @@
 import ffmpeg
 import os
 import asyncio
-import edge_tts
 import uuid
 import time
 import math
-from google import genai
-from google.genai import types
-from groq import Groq
+import re
+import json
+import shutil
+import tempfile
+import hashlib
+import subprocess
+import threading
+import importlib
+from concurrent.futures import ThreadPoolExecutor
+from ai_cache import AnalysisCache, file_cache_key
+from metrics import metrics
+from probe_cache import ProbeCache
 
-# --- 1. GEMINI MANAGER (DYNAMIC FETCH & FLASH ONLY) ---
-class GeminiManager:
-    def __init__(self):
-        self.keys = []
-        for i in range(1, 6):
-            k = os.getenv(f'GEMINI_API_KEY_{i}')
-            if k: self.keys.append(k)
-        
-        if not self.keys:
-            k = os.getenv('GEMINI_API_KEY')
-            if k: self.keys.append(k)
+# --- 0. LAZY SDKS ---
+# google-genai, groq and edge-tts take seconds to import between them, so they
+# load on first use instead of at import time; prewarm() pulls them in on a
+# background thread once the server is already answering requests.
+SDK_MODULES = ('google.genai', 'groq', 'edge_tts')
+WARM_STATUS = {}  # module -> {'loaded': bool, 'seconds' | 'error'}
+
+def prewarm(extra=()):
+    def run():
+        for name in SDK_MODULES + tuple(extra):
+            started = time.perf_counter()
+            try:
+                importlib.import_module(name)
+                WARM_STATUS[name] = {'loaded': True, 'seconds': round(time.perf_counter() - started, 3)}
+            except Exception as e:
+                WARM_STATUS[name] = {'loaded': False, 'error': str(e)}
+        get_gemini_manager()
+        print(f"🔥 Pre-warmed: {', '.join(n for n, s in WARM_STATUS.items() if s['loaded'])}")
+    threading.Thread(target=run, daemon=True).start()
+
+# --- 1. GEMINI MANAGER (KEY POOL, DYNAMIC FETCH & FLASH ONLY) ---
+# Thread-safe pool over every GEMINI_API_KEY_n. Each key has a token bucket
+# (RPM_LIMIT per minute), an in-flight count and an EWMA of observed latency;
+# a 429/403 drains the bucket and cools the key down with exponential backoff.
+# GEMINI_RPM_LIMIT is the per-key budget of the whole deployment: every
+# gunicorn process (WEB_CONCURRENCY) keeps its own buckets with an equal share.
+# Callers wait on a condition (or asyncio.sleep) instead of spinning.
+TRANSLATE_SYSTEM_PROMPT = (
+    "You are a Translator. Convert the input English text into 'Natural Spoken Burmese' (အပြောစကား). "
+    "Output ONLY the Burmese translation. No Markdown."
+)
+
+TRANSLATE_CHUNK_CHARS = int(os.getenv('TRANSLATE_CHUNK_CHARS', 4000))
+TRANSLATE_CHUNK_RETRIES = int(os.getenv('TRANSLATE_CHUNK_RETRIES', 3))
+
+def is_translation_error(text):
+    return not text or text.startswith(("Translation Failed", "System Busy"))
 
+def split_translation_chunks(text, max_chars=None):
+    """Packs whole sentences into chunks of at most max_chars (a single longer sentence stands alone)."""
+    max_chars = max_chars or TRANSLATE_CHUNK_CHARS
+    chunks, current = [], ""
+    for sentence in re.split(r'(?<=[.!?])\s+|\n+', text.strip()):
+        if not sentence: continue
+        if current and len(current) + 1 + len(sentence) > max_chars:
+            chunks.append(current)
+            current = sentence
+        else:
+            current = f"{current} {sentence}" if current else sentence
+    if current: chunks.append(current)
+    return chunks
+
+def load_gemini_keys():
+    numbered = sorted(
+        ((int(m.group(1)), v) for k, v in os.environ.items()
+         for m in [re.fullmatch(r'GEMINI_API_KEY_(\d+)', k)] if m and v),
+        key=lambda kv: kv[0])
+    keys = [v for _, v in numbered]
+    if not keys and os.getenv('GEMINI_API_KEY'): keys.append(os.getenv('GEMINI_API_KEY'))
+    return keys
+
+class GeminiManager:
+    def __init__(self, keys=None):
+        self.keys = keys if keys is not None else load_gemini_keys()
+        self.RPM_LIMIT = max(1.0, int(os.getenv('GEMINI_RPM_LIMIT', 12)) / max(1, int(os.getenv('WEB_CONCURRENCY', 1))))
+        self.WAIT_TIMEOUT = float(os.getenv('GEMINI_WAIT_TIMEOUT', 120))
         self.key_models_cache = {}
+        self.clients = {}
         self.key_status = {}
+        now = time.monotonic()
         for k in self.keys:
-            self.key_status[k] = {"usage_count": 0, "window_start": time.time(), "cooldown_until": 0}
-        self.RPM_LIMIT = 12
+            self.key_status[k] = {"tokens": float(self.RPM_LIMIT), "refilled_at": now, "cooldown_until": 0.0,
+                                  "strikes": 0, "in_flight": 0, "latency": 2.0, "usage_count": 0}
+        self._cond = threading.Condition()
+        self.chunk_cache = None  # AnalysisCache for per-chunk results, wired up below
+
+    # --- KEY SELECTION ---
+    def _refill(self, stats, now):
+        stats["tokens"] = min(float(self.RPM_LIMIT), stats["tokens"] + (now - stats["refilled_at"]) * self.RPM_LIMIT / 60.0)
+        stats["refilled_at"] = now
 
-    def get_healthy_key(self):
-        current_time = time.time()
+    def _try_acquire(self):
+        """Under the lock: (key, 0) if a key is free now, else (None, seconds until one could be)."""
+        now = time.monotonic()
+        best, best_score, wait = None, None, 60.0
         for key in self.keys:
             stats = self.key_status[key]
-            if current_time < stats["cooldown_until"]: continue
-            if current_time - stats["window_start"] > 60:
-                stats["usage_count"] = 0; stats["window_start"] = current_time
-            if stats["usage_count"] < self.RPM_LIMIT:
-                stats["usage_count"] += 1
-                return key
-        time.sleep(1)
-        return self.get_healthy_key()
-
-    def mark_key_error(self, key):
-        print(f"⚠️ Key Error on ...{key[-4:]}. Cooling down.")
-        self.key_status[key]["cooldown_until"] = time.time() + 60
+            self._refill(stats, now)
+            if now < stats["cooldown_until"]:
+                wait = min(wait, stats["cooldown_until"] - now)
+                continue
+            if stats["tokens"] < 1:
+                wait = min(wait, (1 - stats["tokens"]) * 60.0 / self.RPM_LIMIT)
+                continue
+            # Prefer fast keys, spread load across keys already busy
+            score = stats["latency"] * (1 + stats["in_flight"])
+            if best_score is None or score < best_score: best, best_score = key, score
+        if best:
+            stats = self.key_status[best]
+            stats["tokens"] -= 1; stats["in_flight"] += 1; stats["usage_count"] += 1
+            return best, 0.0
+        return None, max(0.05, wait)
+
+    def get_healthy_key(self, timeout=None):
+        """Blocks until a key has budget; returns None if none frees up within timeout."""
+        if not self.keys: return None
+        deadline = time.monotonic() + (self.WAIT_TIMEOUT if timeout is None else timeout)
+        with self._cond:
+            while True:
+                key, wait = self._try_acquire()
+                if key: return key
+                remaining = deadline - time.monotonic()
+                if remaining <= 0: return None
+                self._cond.wait(min(wait, remaining))
+
+    async def get_healthy_key_async(self, timeout=None):
+        if not self.keys: return None
+        deadline = time.monotonic() + (self.WAIT_TIMEOUT if timeout is None else timeout)
+        while True:
+            with self._cond: key, wait = self._try_acquire()
+            if key: return key
+            remaining = deadline - time.monotonic()
+            if remaining <= 0: return None
+            await asyncio.sleep(min(wait, remaining, 1.0))
+
+    def release_key(self, key, latency=None):
+        with self._cond:
+            stats = self.key_status[key]
+            stats["in_flight"] = max(0, stats["in_flight"] - 1)
+            if latency is not None:
+                stats["latency"] = 0.8 * stats["latency"] + 0.2 * latency
+                stats["strikes"] = 0
+            self._cond.notify_all()
+
+    def mark_key_error(self, key, forbidden=False):
+        with self._cond:
+            stats = self.key_status[key]
+            stats["strikes"] += 1
+            cooldown = 600 if forbidden else min(300, 30 * 2 ** (stats["strikes"] - 1))
+            stats["cooldown_until"] = time.monotonic() + cooldown
+            stats["tokens"] = 0.0
+        print(f"⚠️ Key Error on ...{key[-4:]}. Cooling down {cooldown}s.")
+
+    # --- CLIENTS / MODELS ---
+    def get_client(self, key):
+        with self._cond:
+            client = self.clients.get(key)
+            if client is None:
+                from google import genai
+                client = self.clients[key] = genai.Client(api_key=key, http_options={'api_version': 'v1beta'})
+            return client
 
     def fetch_flash_models(self, client, key):
         if key in self.key_models_cache: return self.key_models_cache[key]
@@ -57,7 +182,33 @@ class GeminiManager:
             return flash_list
         except: return ["gemini-1.5-flash"]
 
-    def translate_text(self, text):
+    def _config(self):
+        from google.genai import types
+        return types.GenerateContentConfig(
+            temperature=0.3,
+            max_output_tokens=8192,
+            system_instruction=TRANSLATE_SYSTEM_PROMPT
+        )
+
+    @staticmethod
+    def _is_rate_limited(err):
+        err = str(err).lower()
+        return "429" in err or "403" in err or "resource exhausted" in err
+
+    def _record(self, model, key, outcome, seconds):
+        # Keys are reported by slot number, never by value
+        slot = f"key{self.keys.index(key) + 1}" if key in self.keys else 'unknown'
+        metrics.inc('recap_gemini_requests_total', model=model, key=slot, outcome=outcome)
+        metrics.observe('recap_gemini_request_seconds', seconds, model=model, key=slot)
+
+    # --- TRANSLATION ---
+    def translate_text(self, text, chunked=None):
+        """English -> Burmese. Long transcripts (or chunked=True) go through translate_chunked."""
+        if chunked or (chunked is None and len(text) > TRANSLATE_CHUNK_CHARS):
+            return self.translate_chunked(text)
+        return self.translate_single(text)
+
+    def translate_single(self, text):
         max_attempts = 3
         attempts = 0
         last_error = ""
@@ -66,190 +217,690 @@ class GeminiManager:
             key = self.get_healthy_key()
             if not key: return "System Busy"
             
+            latency = None
             try:
-                client = genai.Client(api_key=key, http_options={'api_version': 'v1beta'})
+                client = self.get_client(key)
                 available_models = self.fetch_flash_models(client, key)
                 
                 for model_name in available_models:
+                    started = time.monotonic()
                     try:
-                        response = client.models.generate_content(
-                            model=model_name,
-                            contents=text,
-                            config=types.GenerateContentConfig(
-                                temperature=0.3,
-                                max_output_tokens=8192,
-                                system_instruction=(
-                                    "You are a Translator. Convert the input English text into 'Natural Spoken Burmese' (အပြောစကား). "
-                                    "Output ONLY the Burmese translation. No Markdown."
-                                )
-                            )
-                        )
+                        response = client.models.generate_content(model=model_name, contents=text, config=self._config())
+                        latency = time.monotonic() - started
+                        self._record(model_name, key, 'ok', latency)
                         return response.text.strip()
                     except Exception as e:
-                        err = str(e).lower()
-                        if "429" in err or "403" in err or "resource exhausted" in err:
-                            self.mark_key_error(key)
+                        last_error = str(e)
+                        self._record(model_name, key, 'rate_limited' if self._is_rate_limited(e) else 'error', time.monotonic() - started)
+                        if self._is_rate_limited(e):
+                            self.mark_key_error(key, forbidden="403" in last_error)
                             break 
                         continue 
             except Exception as e:
                 last_error = str(e)
+            finally:
+                self.release_key(key, latency)
             attempts += 1
         return f"Translation Failed: {last_error}"
 
-gemini_manager = GeminiManager()
+    # --- CHUNKED TRANSLATION ---
+    # One call per ~TRANSLATE_CHUNK_CHARS of sentence-aligned text keeps each
+    # answer under max_output_tokens (Burmese costs several tokens per English
+    # word) and fans the chunks out over every healthy key at once.
+    def _chunk_cache_key(self, chunk):
+        return 'chunk-' + hashlib.sha256(f"{TRANSLATE_SYSTEM_PROMPT}\n{chunk}".encode('utf-8')).hexdigest()[:32]
 
-# --- 2. GROQ LOGIC ---
-def transcribe_audio_groq(audio_path):
+    def _translate_chunk(self, chunk):
+        keys = [self._chunk_cache_key(chunk)]
+        if self.chunk_cache:
+            cached = self.chunk_cache.read_text(keys, 'chunk.txt')
+            if cached: return cached
+        result = ""
+        for attempt in range(TRANSLATE_CHUNK_RETRIES):
+            result = self.translate_single(chunk)
+            if not is_translation_error(result):
+                if self.chunk_cache: self.chunk_cache.store_text(keys, 'chunk.txt', result)
+                return result
+            print(f"⚠️ Chunk translation attempt {attempt + 1} failed: {result[:80]}")
+        raise RuntimeError(result)
+
+    def translate_chunked(self, text):
+        chunks = split_translation_chunks(text)
+        if len(chunks) <= 1: return self.translate_single(text)
+        print(f"🧩 Gemini: {len(text)} chars -> {len(chunks)} chunks across {len(self.keys)} keys")
+        with ThreadPoolExecutor(max_workers=max(1, min(len(chunks), len(self.keys) * 2))) as pool:
+            futures = [pool.submit(self._translate_chunk, c) for c in chunks]
+            parts, failed = [], 0
+            for f in futures:
+                try: parts.append(f.result())
+                except Exception as e: failed += 1; last_error = str(e)
+        # Finished chunks stay cached, so a retry of the whole transcript only redoes these
+        if failed: return f"Translation Failed: {failed}/{len(chunks)} chunks ({last_error})"
+        return "\n".join(parts)
+
+    async def translate_text_async(self, text):
+        """asyncio variant: waits for a key without blocking the loop and uses the SDK's async client."""
+        last_error = ""
+        for _ in range(3):
+            key = await self.get_healthy_key_async()
+            if not key: return "System Busy"
+            latency = None
+            try:
+                client = self.get_client(key)
+                available_models = await asyncio.to_thread(self.fetch_flash_models, client, key)
+                for model_name in available_models:
+                    started = time.monotonic()
+                    try:
+                        response = await client.aio.models.generate_content(model=model_name, contents=text, config=self._config())
+                        latency = time.monotonic() - started
+                        self._record(model_name, key, 'ok', latency)
+                        return response.text.strip()
+                    except Exception as e:
+                        last_error = str(e)
+                        self._record(model_name, key, 'rate_limited' if self._is_rate_limited(e) else 'error', time.monotonic() - started)
+                        if self._is_rate_limited(e):
+                            self.mark_key_error(key, forbidden="403" in last_error)
+                            break
+            except Exception as e:
+                last_error = str(e)
+            finally:
+                self.release_key(key, latency)
+        return f"Translation Failed: {last_error}"
+
+    def stats(self):
+        now = time.monotonic()
+        with self._cond:
+            return [{'key': f"...{k[-4:]}", 'tokens': round(s["tokens"], 2), 'in_flight': s["in_flight"],
+                     'latency': round(s["latency"], 3), 'cooldown': round(max(0.0, s["cooldown_until"] - now), 1),
+                     'usage_count': s["usage_count"]} for k, s in self.key_status.items()]
+
+gemini_manager = None  # built on first use, see get_gemini_manager()
+_gemini_lock = threading.Lock()
+
+def get_gemini_manager():
+    global gemini_manager
+    if gemini_manager is None:
+        with _gemini_lock:
+            if gemini_manager is None:
+                manager = GeminiManager()
+                manager.chunk_cache = analysis_cache
+                gemini_manager = manager
+    return gemini_manager
+
+# --- 2. GROQ LOGIC (CHUNKED + PARALLEL) ---
+GROQ_MODEL = "whisper-large-v3-turbo"
+GROQ_MAX_UPLOAD_BYTES = int(os.getenv('GROQ_MAX_UPLOAD_MB', 20)) * 1024 * 1024
+TRANSCRIBE_CHUNK_SECONDS = int(os.getenv('TRANSCRIBE_CHUNK_SECONDS', 600))
+TRANSCRIBE_CONCURRENCY = int(os.getenv('TRANSCRIBE_CONCURRENCY', 4))
+
+def groq_api_key():
+    return os.getenv('GROQ_API_KEY_1') or os.getenv('GROQ_API_KEY')
+
+def get_groq_client():
+    k = groq_api_key()
+    if not k: return None
+    from groq import Groq
+    return Groq(api_key=k)
+
+def detect_silences(audio_path, noise='-35dB', min_silence=0.4):
+    """Midpoints (seconds) of silent stretches, from one ffmpeg silencedetect pass."""
+    _, err = (
+        ffmpeg.input(audio_path)
+        .filter('silencedetect', noise=noise, d=min_silence)
+        .output('-', format='null')
+        .run(capture_stdout=True, capture_stderr=True)
+    )
+    points, start = [], None
+    for line in err.decode('utf-8', 'ignore').splitlines():
+        m = re.search(r'silence_(start|end): (-?[\d.]+)', line)
+        if not m: continue
+        if m.group(1) == 'start': start = max(0.0, float(m.group(2)))
+        elif start is not None:
+            points.append((start + float(m.group(2))) / 2)
+            start = None
+    return points
+
+def plan_audio_chunks(duration, silences, target=TRANSCRIBE_CHUNK_SECONDS):
+    """Splits [0, duration] into ~target second chunks, cutting at the silence nearest each boundary."""
+    cuts, pos = [], 0.0
+    while duration - pos > target * 1.25:
+        ideal = pos + target
+        window = [s for s in silences if abs(s - ideal) <= target * 0.25 and s > pos]
+        cut = min(window, key=lambda s: abs(s - ideal)) if window else ideal
+        cuts.append(cut)
+        pos = cut
+    bounds = [0.0] + cuts + [duration]
+    return list(zip(bounds[:-1], bounds[1:]))
+
+def _segments_from_response(transcription, offset, chunk_end):
+    segs = getattr(transcription, 'segments', None)
+    if segs is None and isinstance(transcription, dict): segs = transcription.get('segments')
+    if segs is None: segs = (getattr(transcription, 'model_extra', None) or {}).get('segments')
+    if segs:
+        out = []
+        for s in segs:
+            get = s.get if isinstance(s, dict) else (lambda k, s=s: getattr(s, k, None))
+            text = (get('text') or '').strip()
+            if text: out.append({'start': round(offset + float(get('start') or 0), 2), 'end': round(offset + float(get('end') or 0), 2), 'text': text})
+        return out
+    text = (getattr(transcription, 'text', None) or str(transcription)).strip()
+    return [{'start': round(offset, 2), 'end': round(chunk_end, 2), 'text': text}] if text else []
+
+def _transcribe_chunk(client, path, offset, chunk_end, attempts=2):
+    for attempt in range(attempts):
+        try:
+            # Hand the SDK the open file instead of reading it into memory first
+            with open(path, "rb") as file:
+                transcription = client.audio.transcriptions.create(
+                    file=(os.path.basename(path), file),
+                    model=GROQ_MODEL,
+                    response_format="verbose_json"
+                )
+            return _segments_from_response(transcription, offset, chunk_end)
+        except Exception as e:
+            print(f"⚠️ Groq Chunk @{offset:.0f}s attempt {attempt + 1} failed: {e}")
+            if attempt + 1 == attempts: raise
+            time.sleep(2)
+
+def transcribe_audio_segments(audio_path):
+    """Timestamped segments [{start, end, text}] in order, or None on failure.
+
+    Small files go up in one request; long ones are cut on silence and the
+    chunks are transcribed concurrently, so latency tracks the slowest chunk.
+    """
+    tmp_dir = None
     try:
-        k = os.getenv('GROQ_API_KEY_1') or os.getenv('GROQ_API_KEY')
-        if not k: return None
-        client = Groq(api_key=k)
-        with open(audio_path, "rb") as file:
-            transcription = client.audio.transcriptions.create(
-                file=(os.path.basename(audio_path), file.read()),
-                model="whisper-large-v3-turbo", 
-                response_format="text"
-            )
-        return str(transcription).strip()
+        client = get_groq_client()
+        if not client: return None
+        duration = probe_media(audio_path)['duration']
+        if os.path.getsize(audio_path) <= GROQ_MAX_UPLOAD_BYTES and duration <= TRANSCRIBE_CHUNK_SECONDS * 1.25:
+            return _transcribe_chunk(client, audio_path, 0.0, duration)
+
+        chunks = plan_audio_chunks(duration, detect_silences(audio_path))
+        print(f"✂️ Groq: {duration:.0f}s audio -> {len(chunks)} chunks")
+        tmp_dir = tempfile.mkdtemp(prefix='groq_')
+        paths = []
+        for i, (s, e) in enumerate(chunks):
+            p = os.path.join(tmp_dir, f"chunk_{i:04d}.mp3")
+            ffmpeg.input(audio_path, ss=s, t=e - s).output(p, acodec='copy').run(quiet=True, overwrite_output=True)
+            paths.append(p)
+
+        with ThreadPoolExecutor(max_workers=max(1, TRANSCRIBE_CONCURRENCY)) as pool:
+            futures = [pool.submit(_transcribe_chunk, client, p, s, e) for p, (s, e) in zip(paths, chunks)]
+            results = [f.result() for f in futures]
+        return [seg for chunk in results for seg in chunk]
     except Exception as e:
         print(f"❌ Groq Transcription Error: {e}")
         return None
+    finally:
+        if tmp_dir: shutil.rmtree(tmp_dir, ignore_errors=True)
+
+def transcribe_audio_groq(audio_path):
+    segments = transcribe_audio_segments(audio_path)
+    if not segments: return None
+    return " ".join(s['text'] for s in segments).strip()
+
+# --- 3. MAIN ANALYSIS (CACHED) ---
+CACHE_FOLDER = os.getenv('CACHE_FOLDER', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'cache'))
+analysis_cache = AnalysisCache(
+    os.path.join(CACHE_FOLDER, 'analysis'),
+    max_bytes=int(os.getenv('ANALYSIS_CACHE_MAX_MB', 2048)) * 1024 * 1024,
+    ttl_seconds=int(os.getenv('ANALYSIS_CACHE_TTL', 7 * 86400)),
+)
+probe_cache = ProbeCache(os.path.join(CACHE_FOLDER, 'probe'))
 
-# --- 3. MAIN ANALYSIS ---
-def analyze_script_with_ai(video_path):
+def probe_media(path, keyframes=False):
+    """Cached probe: duration, width/height, codecs (and the keyframe index if asked)."""
+    return probe_cache.get(path, keyframes=keyframes)
+
+def extract_audio(video_path, audio_path):
+    (
+        ffmpeg.input(video_path)
+        .output(audio_path, format='mp3', acodec='libmp3lame', ab='64k') 
+        .run(quiet=True, overwrite_output=True)
+    )
+
+def is_analysis_error(text):
+    """analyze_script_with_ai reports failures as text instead of raising."""
+    return is_translation_error(text) or text.startswith(("Transcription Failed", "Error:"))
+
+def analyze_script_with_ai(video_path, cache_key=None, progress=None):
+    """Audio -> English -> Burmese, reusing any stage already cached for this source.
+
+    cache_key is the canonical video ID key for downloads; the sampled file
+    hash is always used as well so /re-analyze hits the same entry.
+    progress, if given, is called as progress(stage) before each stage.
+    """
+    progress = progress or (lambda *a, **k: None)
     unique_id = str(uuid.uuid4())[:8]
     audio_path = f"temp_{unique_id}.mp3"
     try:
-        if os.path.exists(audio_path): os.remove(audio_path)
-        (
-            ffmpeg.input(video_path)
-            .output(audio_path, format='mp3', acodec='libmp3lame', ab='64k') 
-            .run(quiet=True, overwrite_output=True)
-        )
-        print("🚀 Step 1: Transcribing with Groq...")
-        english_text = transcribe_audio_groq(audio_path)
+        keys = [k for k in (cache_key, file_cache_key(video_path)) if k]
+
+        burmese_text = analysis_cache.read_text(keys, 'translation.txt')
+        if burmese_text: return burmese_text
+
+        english_text = analysis_cache.read_text(keys, 'transcript.txt')
         if not english_text:
-            if os.path.exists(audio_path): os.remove(audio_path)
-            return "Transcription Failed (Check Groq Key)"
+            cached_audio = analysis_cache.lookup(keys, 'audio.mp3')
+            if not cached_audio:
+                progress('extracting')
+                with metrics.span('extract_audio'):
+                    extract_audio(video_path, audio_path)
+                cached_audio = analysis_cache.store_file(keys, 'audio.mp3', audio_path)
+            print("🚀 Step 1: Transcribing with Groq...")
+            progress('transcribing')
+            with metrics.span('transcribe'):
+                segments = transcribe_audio_segments(cached_audio)
+            if not segments:
+                return "Transcription Failed (Check Groq Key)"
+            english_text = " ".join(s['text'] for s in segments).strip()
+            analysis_cache.store_text(keys, 'segments.json', json.dumps(segments, ensure_ascii=False))
+            analysis_cache.store_text(keys, 'transcript.txt', english_text)
             
         print(f"🧠 Step 2: Translating {len(english_text)} chars with Gemini...")
-        burmese_text = gemini_manager.translate_text(english_text)
-        
-        if os.path.exists(audio_path): os.remove(audio_path)
+        progress('translating')
+        with metrics.span('translate'):
+            burmese_text = get_gemini_manager().translate_text(english_text)
+        if not is_translation_error(burmese_text):
+            analysis_cache.store_text(keys, 'translation.txt', burmese_text)
         return burmese_text
     except Exception as e:
-        if os.path.exists(audio_path): os.remove(audio_path)
         return f"Error: {str(e)}"
+    finally:
+        if os.path.exists(audio_path): os.remove(audio_path)
+
+# --- 4. SEGMENTED TTS (PARALLEL + CACHED) ---
+# Scripts are synthesized one sentence at a time, so an edit only
+# re-synthesizes the sentences that changed; the rest come from the cache.
+TTS_CONCURRENCY = int(os.getenv('TTS_CONCURRENCY', 4))
+TTS_SEGMENT_CHARS = int(os.getenv('TTS_SEGMENT_CHARS', 400))
+TTS_CACHE_FOLDER = os.path.join(CACHE_FOLDER, 'tts')
+# One entry per (voice, sentence), with the same TTL + LRU byte budget as the analysis cache
+tts_cache = AnalysisCache(
+    TTS_CACHE_FOLDER,
+    max_bytes=int(os.getenv('TTS_CACHE_MAX_MB', 1024)) * 1024 * 1024,
+    ttl_seconds=int(os.getenv('TTS_CACHE_TTL', 7 * 86400)),
+)
+VOICES = {'male': "my-MM-ThihaNeural", 'female': "my-MM-NilarNeural"}
+
+def split_tts_segments(text, max_chars=TTS_SEGMENT_CHARS):
+    """Sentence-sized segments (Burmese ။ and Latin .!? boundaries); overlong sentences split on spaces."""
+    segments = []
+    for sentence in re.split(r'(?<=။)\s*|(?<=[.!?])\s+|\n+', text):
+        sentence = sentence.strip()
+        while len(sentence) > max_chars:
+            cut = sentence.rfind(' ', 0, max_chars)
+            cut = cut if cut > 0 else max_chars
+            segments.append(sentence[:cut].strip())
+            sentence = sentence[cut:].strip()
+        if sentence: segments.append(sentence)
+    return segments
+
+def script_slice(text, start_frac, end_frac):
+    """The TTS segments under [start_frac, end_frac] of a script, using characters as a proxy for speaking time.
+    Returns (slice_text, (lo, hi)): the fractions of the whole script the slice actually spans."""
+    segments = split_tts_segments(text)
+    total = sum(len(s) for s in segments) or 1
+    picked, pos, lo, hi = [], 0, None, 0.0
+    for seg in segments:
+        a, b = pos / total, (pos + len(seg)) / total
+        pos += len(seg)
+        if b < start_frac or a > end_frac: continue
+        if lo is None: lo = a
+        picked.append(seg)
+        hi = b
+    return ' '.join(picked), (lo or 0.0, hi)
+
+def tts_cache_key(text, voice):
+    return hashlib.sha256(f"{voice}\n{text}".encode('utf-8')).hexdigest()
 
-# --- 4. VIDEO PROCESSING (UPDATED WITH TEXT WATERMARK FIX) ---
 async def generate_voice(text, output_file, voice):
+    import edge_tts
     communicate = edge_tts.Communicate(text, voice)
     await communicate.save(output_file)
 
-def create_ai_audio(text, output_path, gender='male'):
-    voice = "my-MM-ThihaNeural" if gender == 'male' else "my-MM-NilarNeural"
-    try: asyncio.run(generate_voice(text, output_path, voice)); return True
-    except: return False
+async def synthesize_segments(segments, voice, progress=None, attempts=2):
+    """Synthesizes uncached segments concurrently (bounded by TTS_CONCURRENCY); returns their cache paths."""
+    sem = asyncio.Semaphore(max(1, TTS_CONCURRENCY))
+    keys = [tts_cache_key(s, voice) for s in segments]
+    paths = [tts_cache.lookup([k], 'voice.mp3') for k in keys]  # a hit refreshes the entry's LRU time
+    todo = [i for i, p in enumerate(paths) if p is None]
+    done = {'n': len(segments) - len(todo)}
+
+    async def one(i):
+        async with sem:
+            tmp = os.path.join(TTS_CACHE_FOLDER, f"{keys[i]}.{uuid.uuid4().hex[:8]}.tmp")
+            for attempt in range(attempts):
+                try:
+                    await generate_voice(segments[i], tmp, voice)
+                    paths[i] = tts_cache.store_file([keys[i]], 'voice.mp3', tmp)
+                    break
+                except Exception:
+                    if os.path.exists(tmp): os.remove(tmp)
+                    if attempt + 1 == attempts: raise
+            done['n'] += 1
+            if progress: progress('synthesizing', done['n'] * 100.0 / len(segments))
 
-def process_video_edit(input_path, output_path, options):
+    if todo: print(f"🗣️ TTS: {len(todo)}/{len(segments)} segments to synthesize")
+    metrics.inc('recap_tts_segments_total', len(segments) - len(todo), source='cache')
+    metrics.inc('recap_tts_segments_total', len(todo), source='synthesized')
+    await asyncio.gather(*(one(i) for i in todo))
+    return paths
+
+def concat_audio(paths, output_path):
+    """Lossless join with the concat demuxer (all segments share edge-tts's mp3 format)."""
+    if len(paths) == 1:
+        shutil.copyfile(paths[0], output_path)
+        return
+    fd, list_path = tempfile.mkstemp(suffix='.txt')
     try:
-        probe = ffmpeg.probe(input_path)
-        vid_info = next(s for s in probe['streams'] if s['codec_type'] == 'video')
-        width = int(vid_info['width'])
-        height = int(vid_info['height'])
-        duration = float(probe['format']['duration'])
+        with os.fdopen(fd, 'w') as f:
+            for p in paths: f.write(f"file '{os.path.abspath(p)}'\n")
+        ffmpeg.input(list_path, format='concat', safe=0).output(output_path, c='copy').run(quiet=True, overwrite_output=True)
+    finally:
+        os.remove(list_path)
+
+def create_ai_audio(text, output_path, gender='male', progress=None):
+    voice = VOICES['male'] if gender == 'male' else VOICES['female']
+    try:
+        segments = split_tts_segments(text)
+        if not segments: return False
+        with metrics.span('tts'):
+            paths = asyncio.run(synthesize_segments(segments, voice, progress=progress))
+            concat_audio(paths, output_path)
+        return True
+    except Exception as e:
+        print(f"❌ TTS Error: {e}")
+        return False
+
+# --- 5. VIDEO PROCESSING (UPDATED WITH TEXT WATERMARK FIX) ---
+def _progress_number(value, cast=float):
+    try: return cast(value or 0)
+    except ValueError: return cast(0)
+
+def run_ffmpeg(output, progress=None, total_seconds=None):
+    """Runs a compiled ffmpeg-python graph, parsing `-progress` output into progress callbacks.
+
+    progress(stage, percent, frame=, fps=, out_time=, speed=, eta=) is called once per
+    ffmpeg progress block (~every 0.5s). Raises RuntimeError with the stderr tail on failure.
+    """
+    args = output.global_args('-progress', 'pipe:1', '-nostats').overwrite_output().compile()
+    with tempfile.TemporaryFile() as err:
+        proc = subprocess.Popen(args, stdout=subprocess.PIPE, stderr=err, stdin=subprocess.DEVNULL)
+        try:
+            block = {}
+            for raw in proc.stdout:
+                key, _, value = raw.decode('utf-8', 'ignore').strip().partition('=')
+                if key != 'progress':
+                    block[key] = value
+                    continue
+                if progress:
+                    # Any field can read 'N/A' until the first packet is written (slow presets, heavy graphs)
+                    out_time = _progress_number(block.get('out_time_us') or block.get('out_time_ms'), int) / 1e6
+                    speed = _progress_number((block.get('speed') or '').rstrip('x'))
+                    info = {'frame': _progress_number(block.get('frame'), int), 'fps': _progress_number(block.get('fps')),
+                            'out_time': round(out_time, 2), 'speed': speed}
+                    percent = None
+                    if total_seconds:
+                        percent = min(100.0, out_time * 100.0 / total_seconds)
+                        if speed > 0: info['eta'] = round(max(0.0, total_seconds - out_time) / speed, 1)
+                    progress('rendering', 100.0 if value == 'end' else percent, **info)
+                block = {}
+            proc.wait()
+        finally:
+            # A failing callback must not leave ffmpeg running unreaped
+            if proc.poll() is None:
+                proc.kill()
+                proc.wait()
+        if proc.returncode != 0:
+            err.seek(0)
+            tail = err.read().decode('utf-8', 'ignore').strip().splitlines()[-5:]
+            raise RuntimeError(f"ffmpeg exited {proc.returncode}: {' | '.join(tail)}")
+
+PREVIEW_SECONDS = float(os.getenv('PREVIEW_SECONDS', 8))
+PREVIEW_HEIGHT = int(os.getenv('PREVIEW_HEIGHT', 360))
+
+# --- ENCODER PROFILES ---
+# 'standard' is the original libx264 veryfast (crf 23) output.
+ENCODER_PROFILES = {
+    'draft':    {'preset': 'ultrafast', 'crf': 28},
+    'standard': {'preset': 'veryfast', 'crf': 23},
+    'archival': {'preset': 'slow', 'crf': 18, 'tune': 'film'},
+}
+DEFAULT_ENCODER_PROFILE = os.getenv('ENCODER_PROFILE', 'standard')
+PREVIEW_PROFILE = {'preset': 'ultrafast', 'crf': 30}
+# Codecs that can be stream-copied into the .mp4 output untouched
+MP4_VIDEO_CODECS = {'h264', 'hevc', 'mpeg4', 'av1'}
+MP4_AUDIO_CODECS = {'aac', 'mp3'}
+
+def apply_video_filters(v, options, width, height):
+    """Per-frame filter chain (flip, speed, zoom, color, blur, logo, text). Returns (stream, changed)."""
+    changed = False
+    if options.get('bypass_flip'): v = v.hflip(); changed = True
+    if options.get('bypass_speed'): 
+        v = v.filter('setpts', 'PTS/1.05'); changed = True
+    
+    if options.get('bypass_zoom'):
+        crop_w = int(width * 0.95)
+        crop_h = int(height * 0.95)
+        v = v.crop(x='(in_w-ow)/2', y='(in_h-oh)/2', width=crop_w, height=crop_h)
+        v = v.filter('scale', width, height)
+        changed = True
+
+    if options.get('bypass_color'):
+        v = v.filter('eq', contrast=1.1, brightness=0.05, saturation=1.2); changed = True
+
+    # Coordinate Fix for Blur
+    if options.get('blur_enabled'):
+        bx = int(options.get('blur_x', 0))
+        by = int(options.get('blur_y', 0))
+        bw = int(options.get('blur_w', 0))
+        bh = int(options.get('blur_h', 0))
+        # delogo rejects a band touching or past the frame edge; keep it 1px inside
+        bx, by = min(max(1, bx), width - 3), min(max(1, by), height - 3)
+        bw, bh = min(bw, width - bx - 1), min(bh, height - by - 1)
+        if bw > 0 and bh > 0:
+            v = v.filter('delogo', x=bx, y=by, w=bw, h=bh); changed = True
+
+    # Logo Overlay
+    if options.get('logo_path'):
+        try:
+            lw = int(options.get('logo_w', 100))
+            lh = int(options.get('logo_h', 100))
+            lx = int(options.get('logo_x', 10))
+            ly = int(options.get('logo_y', 10))
+            logo = ffmpeg.input(options['logo_path']).filter('scale', lw, lh)
+            v = v.overlay(logo, x=lx, y=ly); changed = True
+        except: pass
+
+    # --- TEXT WATERMARK (FIXED) ---
+    if options.get('text_watermark'):
+        try:
+            txt_content = options['text_watermark']
+            # Coordinates from HTML/Frontend
+            tx = int(options.get('text_x', 10))
+            ty = int(options.get('text_y', 10))
+            
+            v = v.drawtext(
+                text=txt_content, 
+                x=tx, 
+                y=ty, 
+                fontsize=35, 
+                fontcolor='white',
+                borderw=2,
+                bordercolor='black',
+                shadowx=2,
+                shadowy=2,
+                shadowcolor='black@0.5'
+            )
+            changed = True
+        except Exception as e:
+            print(f"⚠️ Text Watermark Error: {e}")
+    return v, changed
+
+# --- SPLIT RENDER (SEGMENT-PARALLEL) ---
+# libx264 stops scaling after a few threads, so long sources are cut at
+# keyframes and every segment gets its own single-digit-thread ffmpeg. The
+# filter chain is time-invariant, so each segment is filtered independently;
+# segments are joined with the concat demuxer and the audio is muxed once.
+SPLIT_RENDER_MIN_SECONDS = float(os.getenv('SPLIT_RENDER_MIN_SECONDS', 600))
+SPLIT_RENDER_PARALLEL = int(os.getenv('SPLIT_RENDER_PARALLEL', 0))  # 0 = one segment per ffmpeg thread
+SPLIT_MIN_SEGMENT_SECONDS = 30.0
+
+def plan_segments(duration, keyframes, count):
+    """Cuts [0, duration) into up to `count` (start, end) pieces, each starting on a keyframe."""
+    cuts = [0.0]
+    for i in range(1, count):
+        target = duration * i / count
+        k = next((t for t in keyframes if t >= target), None)
+        if k is None or k >= duration - 1: break
+        if k - cuts[-1] >= 1: cuts.append(k)
+    return [(s, e) for s, e in zip(cuts, cuts[1:] + [duration])]
+
+def split_render(input_path, output_path, audio, options, width, height, duration, encoder,
+                 copy_audio, threads=None, progress=None):
+    """Segment-parallel render. Returns False (nothing done) if the source can't be usefully split."""
+    budget = threads or os.cpu_count() or 1
+    parallel = SPLIT_RENDER_PARALLEL or budget
+    count = min(parallel * 2, int(duration // SPLIT_MIN_SEGMENT_SECONDS))
+    if parallel < 2 or count < 2: return False
+    segments = plan_segments(duration, probe_media(input_path, keyframes=True)['keyframes'] or [], count)
+    if len(segments) < 2: return False
+
+    speed = 1.05 if options.get('bypass_speed') else 1.0
+    seg_threads = max(1, budget // parallel)
+    print(f"🧩 Split Render: {len(segments)} segments, {parallel} at a time x {seg_threads} thread(s)")
+    tmp_dir = tempfile.mkdtemp(prefix='split_', dir=os.path.dirname(os.path.abspath(output_path)))
+    lengths = [(e - s) / speed for s, e in segments]
+    done = [0.0] * len(segments)
+
+    def segment_progress(i):
+        def report(stage, percent=None, **info):
+            done[i] = lengths[i] if percent == 100.0 else min(lengths[i], info.get('out_time', 0.0))
+            if progress: progress('rendering', sum(done) * 100.0 / sum(lengths), segments=len(segments))
+        return report
+
+    def render_segment(i):
+        start, end = segments[i]
+        v, _ = apply_video_filters(ffmpeg.input(input_path, ss=start, t=end - start).video, options, width, height)
+        path = os.path.join(tmp_dir, f"seg_{i:04d}.mp4")
+        out = ffmpeg.output(v, path, vcodec='libx264', an=None, threads=seg_threads, **encoder)
+        run_ffmpeg(out.global_args('-filter_threads', str(seg_threads)), progress=segment_progress(i), total_seconds=lengths[i])
+        return path
+
+    def render_audio():
+        # Full-length track (AI voice + atempo sync included) encoded alongside the video segments
+        path = os.path.join(tmp_dir, 'audio.m4a')
+        run_ffmpeg(ffmpeg.output(audio, path, vn=None, acodec='copy' if copy_audio else 'aac'))
+        return path
+
+    try:
+        with ThreadPoolExecutor(max_workers=parallel + 1) as pool:
+            audio_future = pool.submit(render_audio)
+            paths = list(pool.map(render_segment, range(len(segments))))
+            audio_path = audio_future.result()
+
+        list_path = os.path.join(tmp_dir, 'segments.txt')
+        with open(list_path, 'w') as f:
+            for p in paths: f.write(f"file '{p}'\n")
+        if progress: progress('muxing')
+        video = ffmpeg.input(list_path, format='concat', safe=0).video
+        run_ffmpeg(ffmpeg.output(video, ffmpeg.input(audio_path).audio, output_path,
+                                 vcodec='copy', acodec='copy', shortest=None, movflags='+faststart'))
+        return True
+    finally:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+
+def process_video_edit(input_path, output_path, options, threads=None, progress=None):
+    try:
+        with metrics.span('probe'):
+            meta = probe_media(input_path)
+        if not meta['has_video']: return False, "No video stream"
+        width, height, duration = meta['width'], meta['height'], meta['duration']
         
-        input_stream = ffmpeg.input(input_path)
+        # --- PREVIEW WINDOW: seek on the input so nothing outside it is decoded ---
+        preview = options.get('preview')
+        window_start, window = 0.0, duration
+        loop_count = 0
+        if preview:
+            window_start = min(max(0.0, float(preview.get('start', 0))), max(0.0, duration - 1))
+            window = min(float(preview.get('duration', PREVIEW_SECONDS)), duration - window_start)
+            input_stream = ffmpeg.input(input_path, ss=window_start, t=window)
+        else:
+            # --- SMART MONEZLATION LOOP (decided first: it shapes the inputs) ---
+            # Looped at the demuxer (-stream_loop): frames are decoded once per pass and never
+            # buffered, so memory stays flat whatever the clip length or resolution.
+            if options.get('monezlation') and duration < 70:
+                target_duration = 70.0
+                total_plays = math.ceil(target_duration / duration)
+                loop_count = total_plays - 1
+                print(f"💰 Loop Calculation: Src={duration}s, Need={target_duration}s -> Plays={total_plays}, Stream_Loop={loop_count}")
+            input_stream = ffmpeg.input(input_path, stream_loop=loop_count) if loop_count else ffmpeg.input(input_path)
+        plays = loop_count + 1
         v = input_stream.video
         a = input_stream.audio
+        audio_changed = False
 
         # --- A. AUDIO SYNC FIRST ---
         if options.get('ai_audio_path') and os.path.exists(options['ai_audio_path']):
-            ai_a = ffmpeg.input(options['ai_audio_path']).audio
-            ai_probe = ffmpeg.probe(options['ai_audio_path'])
-            ai_duration = float(ai_probe['format']['duration'])
+            ai_a = (ffmpeg.input(options['ai_audio_path'], stream_loop=loop_count) if loop_count else ffmpeg.input(options['ai_audio_path'])).audio
+            ai_duration = probe_media(options['ai_audio_path'])['duration']
             
             if duration > 0 and ai_duration > 0:
-                tempo = ai_duration / duration
+                # Previews voice only a slice of the script (ai_audio_span); scale it up to the full track's length
+                span = options.get('ai_audio_span')
+                full_duration = ai_duration / max(span[1] - span[0], 1e-3) if span else ai_duration
+                tempo = full_duration / duration
                 if tempo < 0.5: tempo = 0.5
                 if tempo > 2.0: tempo = 2.0
-                a = ai_a.filter('atempo', tempo).filter('atrim', duration=duration)
+                if preview:
+                    offset = window_start * tempo - (span[0] * full_duration if span else 0.0)
+                    ai_a = ffmpeg.input(options['ai_audio_path'], ss=max(0.0, offset)).audio
+                a = ai_a.filter('atempo', tempo).filter('atrim', duration=window * plays)
             else:
                 a = ai_a
-
-        # --- B. SMART MONEZLATION LOOP ---
-        if options.get('monezlation') and duration < 70:
-            target_duration = 70.0
-            total_plays = math.ceil(target_duration / duration)
-            loop_count = total_plays - 1
-            
-            print(f"💰 Loop Calculation: Src={duration}s, Need={target_duration}s -> Plays={total_plays}, FFmpeg_Loop={loop_count}")
-
-            if loop_count > 0:
-                v = v.filter('loop', loop=loop_count, size=32767)
-                a = a.filter('aloop', loop=loop_count, size=2147483647)
-                duration = duration * total_plays
+            audio_changed = True
+        duration = window * plays
+        looped = loop_count > 0
+        if looped: audio_changed = True
 
         # Filters
-        if options.get('bypass_flip'): v = v.hflip()
-        if options.get('bypass_speed'): 
-            v = v.filter('setpts', 'PTS/1.05')
-            a = a.filter('atempo', '1.05')
-        
-        if options.get('bypass_zoom'):
-            crop_w = int(width * 0.95)
-            crop_h = int(height * 0.95)
-            v = v.crop(x='(in_w-ow)/2', y='(in_h-oh)/2', width=crop_w, height=crop_h)
-            v = v.filter('scale', width, height)
-
-        if options.get('bypass_color'):
-            v = v.filter('eq', contrast=1.1, brightness=0.05, saturation=1.2)
-
-        # Coordinate Fix for Blur
-        if options.get('blur_enabled'):
-            bx = int(options.get('blur_x', 0))
-            by = int(options.get('blur_y', 0))
-            bw = int(options.get('blur_w', 0))
-            bh = int(options.get('blur_h', 0))
-            if bw > 0 and bh > 0:
-                v = v.filter('delogo', x=bx, y=by, w=bw, h=bh)
-
-        # Logo Overlay
-        if options.get('logo_path'):
-            try:
-                lw = int(options.get('logo_w', 100))
-                lh = int(options.get('logo_h', 100))
-                lx = int(options.get('logo_x', 10))
-                ly = int(options.get('logo_y', 10))
-                logo = ffmpeg.input(options['logo_path']).filter('scale', lw, lh)
-                v = v.overlay(logo, x=lx, y=ly)
-            except: pass
-
-        # --- TEXT WATERMARK (FIXED) ---
-        if options.get('text_watermark'):
-            try:
-                txt_content = options['text_watermark']
-                # Coordinates from HTML/Frontend
-                tx = int(options.get('text_x', 10))
-                ty = int(options.get('text_y', 10))
-                
-                v = v.drawtext(
-                    text=txt_content, 
-                    x=tx, 
-                    y=ty, 
-                    fontsize=35, 
-                    fontcolor='white',
-                    borderw=2,
-                    bordercolor='black',
-                    shadowx=2,
-                    shadowy=2,
-                    shadowcolor='black@0.5'
-                )
-            except Exception as e:
-                print(f"⚠️ Text Watermark Error: {e}")
+        v, video_changed = apply_video_filters(v, options, width, height)
+        if options.get('bypass_speed'):
+            a = a.filter('atempo', '1.05'); audio_changed = True
 
-        output = ffmpeg.output(v, a, output_path, vcodec='libx264', acodec='aac', preset='veryfast', shortest=None)
-        output.run(overwrite_output=True, quiet=True)
+        # --- C. ENCODER PROFILE / STREAM COPY ---
+        # Voice-only jobs leave the picture untouched: copy the video bitstream and only mux the new audio.
+        copy_video = not (video_changed or looped or preview) and meta['video_codec'] in MP4_VIDEO_CODECS
+        copy_audio = not audio_changed and meta['audio_codec'] in MP4_AUDIO_CODECS
+        out_kwargs = {'vcodec': 'copy' if copy_video else 'libx264', 'acodec': 'copy' if copy_audio else 'aac', 'shortest': None}
+        if preview:
+            # Scaled last so blur/logo/text coordinates stay in source pixels
+            if height > PREVIEW_HEIGHT: v = v.filter('scale', -2, PREVIEW_HEIGHT)
+            out_kwargs.update(PREVIEW_PROFILE)
+        elif not copy_video:
+            out_kwargs.update(ENCODER_PROFILES.get(options.get('encoder_profile') or DEFAULT_ENCODER_PROFILE, ENCODER_PROFILES['standard']))
+        if copy_video: out_kwargs['movflags'] = '+faststart'
+        if threads: out_kwargs['threads'] = threads
+        output = ffmpeg.output(v, a, output_path, **out_kwargs)
+        if threads:
+            # Cap encoder + filter threads so parallel renders don't oversubscribe the CPU
+            output = output.global_args('-filter_threads', str(threads))
+        out_duration = duration / 1.05 if options.get('bypass_speed') else duration
+        print(f"🎞️ Render: video={'copy' if copy_video else out_kwargs.get('preset')}, audio={out_kwargs['acodec']}")
+        started = time.perf_counter()
+        split = not (copy_video or preview or looped) and options.get('split_render', duration >= SPLIT_RENDER_MIN_SECONDS)
+        if split:
+            encoder = {k: v for k, v in out_kwargs.items() if k not in ('vcodec', 'acodec', 'shortest', 'threads')}
+            with metrics.span('render', mode='split'):
+                split = split_render(input_path, output_path, a, options, width, height, duration, encoder, copy_audio,
+                                     threads=threads, progress=progress)
+        if not split:
+            with metrics.span('render', mode='preview' if preview else 'full'):
+                run_ffmpeg(output, progress=progress, total_seconds=out_duration)
+        elapsed = time.perf_counter() - started
+        if elapsed > 0: metrics.observe('recap_render_realtime_factor', out_duration / elapsed)
         return True, "Success"
         
     except Exception as e: